@@ -6,9 +6,14 @@ class WDISUI:
 
 
 def parse_startup_info(xml_path):
+    # xml_path can also be a seekable file-like object opened in binary mode
     try:
-        with open(xml_path,'rb') as f:
-            root = ET.fromstring(f.read())
+        if hasattr(xml_path, 'read'):
+            xml_path.seek(0)
+            root = ET.fromstring(xml_path.read())
+        else:
+            with open(xml_path,'rb') as f:
+                root = ET.fromstring(f.read())
     
         res = []
 
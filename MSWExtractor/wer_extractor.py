@@ -12,13 +12,15 @@ EPOCH_AS_FILETIME = 116444736000000000  # January 1, 1970 as MS file time
 HUNDREDS_OF_NANOSECONDS = 10000000
 DEFAULT_VALUE = 'N/A'
 
+# Every function takes the path of the report or a seekable file-like object
+# opened in binary mode (eg: a stream over the evidence)
+
 def is_file_wer(path_to_file):
     try:
-        f = codecs.open(os.path.join(path_to_file),
-                        'r', encoding='utf-16le')
+        f = _open_report(path_to_file)
         line_one = f.readline()
         line_two = f.readline()
-        f.close()
+        _close_report(f, path_to_file)
         if('Version=' in line_one or 'EventType=' in line_two):
             return True
     except:
@@ -100,15 +102,28 @@ def find_dmp_files(path_to_file):
     return res
 
 
+def _open_report(path_to_file):
+    if isinstance(path_to_file, basestring):
+        return codecs.open(path_to_file, 'r', encoding='utf-16le')
+    path_to_file.seek(0)
+    return codecs.getreader('utf-16le')(path_to_file)
+
+
+def _close_report(f, path_to_file):
+    # File-like objects belong to the caller
+    if isinstance(path_to_file, basestring):
+        f.close()
+
+
 def _read_file_lines(path_to_file):
     clean_lines = []
     try:
-        f = codecs.open(path_to_file, 'r', encoding='utf-16le')
+        f = _open_report(path_to_file)
         lines = f.readlines()
         for line in lines:
             clean_line = line.strip().encode("utf-8")
             clean_lines.append(clean_line)
-        f.close()
+        _close_report(f, path_to_file)
     except IOError:
         raise
     return clean_lines
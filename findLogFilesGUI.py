@@ -2,22 +2,24 @@
 
 import jarray
 import inspect
+import hashlib
 import os
 import re
 import logextractor
 import MSWExtractor
-import netaddr
 import time
-import socket
 import shutil
 import threading
 import datetime
 import sys
+from collections import OrderedDict
 
 from Registry import Registry
 from java.lang import System
 from java.lang import Class
+from java.lang import Long
 from java.lang import Exception as JavaException
+from java.util import ArrayList
 from java.util.logging import Level
 from javax.swing import JCheckBox
 from javax.swing import BoxLayout
@@ -32,7 +34,11 @@ from javax.swing import JButton
 from javax.swing import JList
 from javax.swing import JScrollPane
 from javax.swing import DefaultListModel
-from java.io import File
+from javax.swing import JFileChooser
+from javax.swing import JOptionPane
+from javax.swing import JTextArea
+from javax.swing import SwingUtilities
+from java.io import IOException as JavaIOException
 from java.sql import DriverManager, SQLException
 
 from org.sleuthkit.autopsy.casemodule import Case
@@ -59,18 +65,73 @@ from org.sleuthkit.datamodel import ReadContentInputStream
 from org.sleuthkit.datamodel import TskData
 from org.sleuthkit.datamodel import TskCoreException, TskException
 from org.sleuthkit.autopsy.coreutils import Logger
-from org.sleuthkit.autopsy.datamodel import ContentUtils
 from java.lang import IllegalArgumentException
+from org.python.core import PyString
+from org.python.core.util import StringUtil
 
 # Constants
-WER_FOLDER_PATH = "\\WERs"
-LOG_FOLDER_PATH = "\\AdhocLogs"
-WSU_FOLDER_PATH = "\\WindowsStartupInfo"
 DB_PATH = "\\guiSettings.db"
+# Artifacts created and posted to the blackboard at a time
+ARTIFACT_BATCH_SIZE = 500
+# Longest time (s) an artifact waits to be posted
+ARTIFACT_FLUSH_INTERVAL = 5
+# Columns added to the settings table by newer versions (name, definition)
+SETTINGS_COLUMNS = (("offlineDNS", "INTEGER NOT NULL DEFAULT 0"),
+                    ("hostsFile", "TEXT NOT NULL DEFAULT ''"),
+                    ("checkLogMACs", "INTEGER NOT NULL DEFAULT 0"),
+                    ("artifactBatchSize", "INTEGER NOT NULL DEFAULT " + str(ARTIFACT_BATCH_SIZE)),
+                    ("artifactFlushInterval", "INTEGER NOT NULL DEFAULT " + str(ARTIFACT_FLUSH_INTERVAL)),
+                    ("checkTimeline", "INTEGER NOT NULL DEFAULT 0"))
+# Bytes read at a time from the evidence by ContentFile
+CONTENT_BUFFER_SIZE = 256 * 1024
+# Maximum number of parsed results kept in the case result cache
+RESULT_CACHE_SIZE = 4096
+# Maximum approximate size (bytes) of the results kept in the case result cache
+RESULT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# Reverse DNS answers kept for the case, in the case directory
+DNS_CACHE_DB_NAME = "LFA_dns_cache.db"
+# Version of the extractors, files processed by another version are processed again
+EXTRACTOR_VERSION = "1.5"
+# Record of the files processed in a case, in the case directory
+LEDGER_DB_NAME = "LFA_ledger.db"
+# Records written to the ledger at a time
+LEDGER_BATCH_SIZE = 100
+# What the ledger knows about a file
+LEDGER_NEW = 0
+LEDGER_UNCHANGED = 1
+LEDGER_CHANGED = 2
+# Settings recorded for a file whose extraction was not complete, so the next
+# run sees it as changed and extracts it again
+LEDGER_INCOMPLETE = "incomplete"
+# Artifacts made from the content of a file, removed before a changed file is
+# processed again (its file artifact is kept)
+EXTRACTED_ARTIFACT_TYPES = ("TSK_LFA_REPORTED_PROGRAMS", "TSK_LFA_LOG_FILE_IP",
+                            "TSK_LFA_LOG_FILE_MAC", "TSK_LFA_WIN_SU_INFO",
+                            "TSK_LFA_INVALID_WER_FILE")
+EXTRACTED_ARTIFACT_PREFIX = "TSK_LFA_CUSTOM_REGEX_"
 
 # Global variables
 G_num_files_found = 0
 G_one_thread_over = False
+# Time budget of the custom RegExes, shared by the threads of each ingest job
+G_regex_guards = {}
+G_regex_guards_lock = threading.Lock()
+# Paths of the files with a file artifact, shared by the threads of each ingest job
+G_registered_paths = {}
+G_registered_paths_lock = threading.Lock()
+# Parsed results of the files of the current case, by content hash
+G_result_cache = None
+G_result_cache_lock = threading.Lock()
+# Files already processed in the current case, so reruns skip them
+G_ledger = None
+G_ledger_lock = threading.Lock()
+# Artifact and attribute types of the current case, by name
+G_type_registry = None
+G_type_registry_lock = threading.Lock()
+# Reverse DNS lookups of the current case, and the settings they were made with
+G_dns_resolver = None
+G_dns_resolver_key = None
+G_dns_resolver_lock = threading.Lock()
 
 
 class LogForensicsForAutopsyFileIngestModuleWithUIFactory(IngestModuleFactoryAdapter):
@@ -86,7 +147,7 @@ class LogForensicsForAutopsyFileIngestModuleWithUIFactory(IngestModuleFactoryAda
         return "This module searchs for certain log files."
 
     def getModuleVersionNumber(self):
-        return "1.5"
+        return EXTRACTOR_VERSION
 
     def getDefaultIngestJobSettings(self):
         return LogForensicsForAutopsyFileIngestModuleWithUISettings()
@@ -124,53 +185,35 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
         self.local_settings = settings
 
     def get_ip_type(self, ip):
-        ip_addr = netaddr.IPAddress(ip)
-        if ip_addr.is_private():
-            return "Private"
-        if ip_addr.is_loopback():
-            return "Loopback"
-        if ip_addr.is_link_local():
-            return "Link-local"
-        if ip_addr.is_reserved():
-            return "Reserved"
-        return "Public"
-
-    def create_temp_directory(self, dir):
-        try:
-            os.mkdir(self.temp_dir + dir)
-        except:
-            self.log(Level.INFO, "ERROR: " + dir + " directory already exists")
-
-    def index_artifact(self, blackboard, artifact, artifact_type):
-        try:
-            # Index the artifact for keyword search
-            blackboard.indexArtifact(artifact)
-        except Blackboard.BlackboardException as e:
-            self.log(Level.SEVERE, "Error indexing artifact " +
-                     artifact.getDisplayName())
-        # Fire an event to notify the UI and others that there is a new log artifact
-        IngestServices.getInstance().fireModuleDataEvent(
-            ModuleDataEvent(LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName,
-                            artifact_type, None))
+        # Classification is cached and shared by all ingest threads
+        return logextractor.log_extractor.get_ip_info(ip).ip_type
 
     def create_artifact_type(self, art_name, art_desc, skCase):
-        try:
-            skCase.addBlackboardArtifactType(art_name, "LFA: " + art_desc)
-        except:
-            self.log(Level.INFO, "ERROR creating artifact type: " + art_desc)
-        art = skCase.getArtifactType(art_name)
+        # Types already resolved by another thread are not looked up again
+        art = self.type_registry.get(('artifact', art_name, art_desc))
+        if art is None:
+            try:
+                skCase.addBlackboardArtifactType(art_name, "LFA: " + art_desc)
+            except:
+                self.log(Level.INFO, "ERROR creating artifact type: " + art_desc)
+            art = self.type_registry.put(('artifact', art_name, art_desc),
+                                         skCase.getArtifactType(art_name))
         self.art_list.append(art)
         return art
 
     def create_attribute_type(self, att_name, type, att_desc, skCase):
-        try:
-            skCase.addArtifactAttributeType(att_name, type, att_desc)
-        except:
-            self.log(Level.INFO, "ERROR creating attribute type: " + att_desc)
-        return skCase.getAttributeType(att_name)
+        att = self.type_registry.get(('attribute', att_name))
+        if att is None:
+            try:
+                skCase.addArtifactAttributeType(att_name, type, att_desc)
+            except:
+                self.log(Level.INFO, "ERROR creating attribute type: " + att_desc)
+            att = self.type_registry.put(('attribute', att_name),
+                                         skCase.getAttributeType(att_name))
+        return att
 
-    def create_invalid_wer_artifact(self, blackboard, file, file_path, reason):
-        art = file.newArtifact(self.art_invalid_wer_file.getTypeID())
+    def create_invalid_wer_artifact(self, file, file_path, reason):
+        art = self.artifact_batch.new_artifact(file, self.art_invalid_wer_file)
 
         # Register case file path
         art.addAttribute(BlackboardAttribute(
@@ -180,13 +223,26 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
         art.addAttribute(BlackboardAttribute(
             self.att_reason_invalid, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, reason))
         # Add artifact to Blackboard
-        self.index_artifact(blackboard, art, self.art_invalid_wer_file)
+        self.artifact_batch.post(art)
+
+    def add_time_attributes(self, art, times):
+        # When an IP or a match showed up in a log with timestamps
+        if times is None:
+            return
+        art.addAttribute(BlackboardAttribute(
+            self.att_first_seen, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(times.first_seen)))
+        art.addAttribute(BlackboardAttribute(
+            self.att_last_seen, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(times.last_seen)))
+        art.addAttribute(BlackboardAttribute(
+            self.att_hourly_counts, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, times.histogram()))
 
     # Where any setup and configuration is done
     def startUp(self, context):
         # For statistics purposes
         self.filesFound = 0
         self.start_time = time.time()
+        # Lines scanned in ad hoc logs and lines skipped by the IP prefilters
+        self.scan_stats = {}
 
         # Get Sleuthkit case
         skCase = Case.getCurrentCase().getSleuthkitCase()
@@ -198,6 +254,33 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
         self.checkDmp = self.local_settings.getCheckDmp()
         self.checkEVTx = self.local_settings.getCheckEVTx()
         self.checkLog = self.local_settings.getCheckLog()
+        self.protocols = self.local_settings.getProtocols()
+        self.checkTimeline = self.local_settings.getCheckTimeline()
+        self.checkLogMACs = self.local_settings.getCheckLogMACs()
+
+        # RegExes that take too long are stopped, and dropped for the rest of the job
+        self.job_id = context.getJobId()
+        with G_regex_guards_lock:
+            if self.job_id not in G_regex_guards:
+                G_regex_guards[self.job_id] = logextractor.log_extractor.RegexGuard()
+            self.regex_guard = G_regex_guards[self.job_id]
+
+        # Files with the same content (eg: VSS copies, the same report on
+        # several images) are parsed once per case, when the hash lookup
+        # module gave them an MD5
+        global G_result_cache
+        case_directory = Case.getCurrentCase().getCaseDirectory()
+        with G_result_cache_lock:
+            if G_result_cache is None or G_result_cache.case_directory != case_directory:
+                G_result_cache = ResultCache(case_directory)
+            self.result_cache = G_result_cache
+
+        # Artifact and attribute types are created once per case
+        global G_type_registry
+        with G_type_registry_lock:
+            if G_type_registry is None or G_type_registry.case_directory != case_directory:
+                G_type_registry = TypeRegistry(case_directory)
+            self.type_registry = G_type_registry
 
         # Create new artifact types
         self.art_list = []
@@ -207,6 +290,8 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             "TSK_LFA_REPORTED_PROGRAMS", "Reported programs", skCase)
         self.art_logged_ip = self.create_artifact_type(
             "TSK_LFA_LOG_FILE_IP", "Logged IP addresses", skCase)
+        self.art_logged_mac = self.create_artifact_type(
+            "TSK_LFA_LOG_FILE_MAC", "Logged MAC addresses", skCase)
         self.art_etl_file = self.create_artifact_type(
             "TSK_LFA_ETL_FILE", "Event Trace Log files", skCase)
         self.art_dmp_file = self.create_artifact_type(
@@ -231,6 +316,45 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                 self.art_custom_regex[regex.regex] = self.create_artifact_type(
                     "TSK_LFA_CUSTOM_REGEX_"+str(idx), regex.name, skCase)
 
+        # Logs are processed again if what is looked up in them changes
+        self.log_settings_fingerprint = hashlib.md5(repr((
+            sorted(self.art_custom_regex.keys()), self.local_settings.getCheckLogIPs(),
+            list(self.protocols), self.checkTimeline, self.checkLogMACs))).hexdigest()
+
+        # Files processed by a previous run of the module on this case
+        global G_ledger
+        with G_ledger_lock:
+            if G_ledger is None or G_ledger.case_directory != case_directory:
+                if G_ledger is not None:
+                    G_ledger.close()
+                try:
+                    G_ledger = IngestLedger(case_directory)
+                except SQLException as e:
+                    self.log(Level.WARNING, "Could not open the ingest ledger: " + str(e))
+                    G_ledger = None
+            self.ledger = G_ledger
+
+        # Artifacts are created, indexed and announced in batches
+        # Blackboard class is used to index blackboard artifacts for keyword search
+        # Files are recorded in the ledger once their artifacts are posted
+        self.artifact_batch = ArtifactBatch(
+            Case.getCurrentCase().getServices().getBlackboard(), self.log,
+            self.local_settings.getArtifactBatchSize(), self.local_settings.getArtifactFlushInterval(),
+            self.ledger)
+
+        # Public IPs are looked up once per case, the answers are kept in the case
+        global G_dns_resolver, G_dns_resolver_key
+        dns_key = (case_directory, self.local_settings.getOfflineDNS(), self.local_settings.getHostsFile())
+        with G_dns_resolver_lock:
+            if G_dns_resolver is None or G_dns_resolver_key != dns_key:
+                if G_dns_resolver is not None:
+                    self.close_dns_resolver(G_dns_resolver)
+                G_dns_resolver = self.create_dns_resolver(case_directory)
+                G_dns_resolver_key = dns_key
+            self.dns_resolver = G_dns_resolver
+        # IP artifacts waiting for their domain
+        self.pending_domains = []
+
         # Create attribute types
         self.att_wer_consent_level = self.create_attribute_type(
            'TSK_LFA_WER_CONSENT_LEVEL', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Consent Level", skCase)
@@ -286,6 +410,33 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
         self.att_ip_domain = self.create_attribute_type(
             'TSK_LFA_IP_DOMAIN', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Domain", skCase)
 
+        self.att_ip_first_offset = self.create_attribute_type(
+            'TSK_LFA_IP_FIRST_OFFSET', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.LONG, "First seen at (B)", skCase)
+
+        self.att_ip_last_offset = self.create_attribute_type(
+            'TSK_LFA_IP_LAST_OFFSET', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.LONG, "Last seen at (B)", skCase)
+
+        self.att_ip_samples = self.create_attribute_type(
+            'TSK_LFA_IP_SAMPLES', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Sample lines", skCase)
+
+        self.att_mac_address = self.create_attribute_type(
+            'TSK_LFA_MAC_ADDRESS', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "MAC address", skCase)
+
+        self.att_mac_vendor = self.create_attribute_type(
+            'TSK_LFA_MAC_VENDOR', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Vendor", skCase)
+
+        self.att_first_seen = self.create_attribute_type(
+            'TSK_LFA_FIRST_SEEN', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.DATETIME, "First seen", skCase)
+
+        self.att_last_seen = self.create_attribute_type(
+            'TSK_LFA_LAST_SEEN', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.DATETIME, "Last seen", skCase)
+
+        self.att_hourly_counts = self.create_attribute_type(
+            'TSK_LFA_HOURLY_COUNTS', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Occurrences per hour", skCase)
+
+        self.att_incomplete = self.create_attribute_type(
+            'TSK_LFA_INCOMPLETE', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Incomplete", skCase)
+
         self.att_windows_ver = self.create_attribute_type(
             'TSK_LFA_WINDOWS_VERSION', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Windows version", skCase)
 
@@ -325,23 +476,24 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
         self.att_reason_invalid = self.create_attribute_type(
             'TSK_LFA_INVALID_REASON', BlackboardAttribute.TSK_BLACKBOARD_ATTRIBUTE_VALUE_TYPE.STRING, "Reason", skCase)
 
-        # Case Temporary directory, where files will be stored
-        self.temp_dir = Case.getCurrentCase().getTempDirectory()
-
         # RegEx pattern to identify WSU files
         self.wsu_patt = re.compile(
             r'.*s-1-5-21-\d+-\d+\-\d+\-\d+_startupinfo\d\.xml')
 
         self.software_hive_location = "Windows/System32/config/SOFTWARE"
-        # Create directories for files
-        if self.checkWER:
-            self.create_temp_directory(WER_FOLDER_PATH)
-
-        if self.checkLog:
-            self.create_temp_directory(LOG_FOLDER_PATH)
 
-        if self.checkWSU:
-            self.create_temp_directory(WSU_FOLDER_PATH)
+        # Files that already have a file artifact, read from the case once per job
+        with G_registered_paths_lock:
+            if self.job_id not in G_registered_paths:
+                registered_paths = RegisteredPaths()
+                for art_type in (self.art_log_file, self.art_wer_file, self.art_dmp_file,
+                                 self.art_etl_file, self.art_evt_file, self.art_windows_startup_file):
+                    for artifact in skCase.getBlackboardArtifacts(art_type.getTypeID()):
+                        attribute = artifact.getAttribute(self.att_case_file_path)
+                        if attribute != None:
+                            registered_paths.add(art_type.getTypeID(), attribute.getValueString())
+                G_registered_paths[self.job_id] = registered_paths
+            self.registered_paths = G_registered_paths[self.job_id]
 
         # Throw an IngestModule.IngestModuleException exception if there was a problem setting up
         # raise IngestModuleException("Oh No!")
@@ -357,19 +509,23 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
 
         full_path = (file.getParentPath() + file.getName())[1:]
 
-        # Use blackboard class to index blackboard artifacts for keyword search
-        blackboard = Case.getCurrentCase().getServices().getBlackboard()
+        # Artifacts waiting for too long are posted, even if the batch is not full
+        self.artifact_batch.flush_if_due()
+
         file_name = file.getName().lower()
 
         if full_path == self.software_hive_location and self.checkWER: 
-            temp_hive_path = os.path.join(self.temp_dir , "SOFTWARE")
             try:
-                ContentUtils.writeToFile(file, File(temp_hive_path))
-            except TskCoreException as e:
+                # The hive is read straight from the evidence
+                hive_content = ContentFile(file)
+                try:
+                    hive = Registry.Registry(hive_content)
+                finally:
+                    hive_content.close()
+            except (IOError, JavaException) as e:
                 self.log(Level.INFO, "TSK ERROR: " + str(e))
                 return IngestModule.ProcessResult.OK
             try:            
-                hive = Registry.Registry(temp_hive_path) 
                 consent_key = hive.open("Microsoft\\Windows\\Windows Error Reporting\\Consent")
                 for subkey in consent_key.values():
                     if subkey.name() == "DefaultConsent":
@@ -395,14 +551,13 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
 
                 self.log(Level.INFO, "WER consent level and state " + wer_consent_key + " " + wer_state)
 
-                art = file.newArtifact(self.art_wer_settings.getTypeID())
+                art = self.artifact_batch.new_artifact(file, self.art_wer_settings)
 
                 art.addAttribute(BlackboardAttribute(self.att_wer_consent_level, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, wer_consent_key))
 
                 art.addAttribute(BlackboardAttribute(self.att_wer_state, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, wer_state))
 
-                self.index_artifact(blackboard, art,self.art_wer_settings)
-                os.remove(self.temp_hive_path)
+                self.artifact_batch.post(art)
             
 
             except:
@@ -414,50 +569,54 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             (file_name.endswith(".wer") and self.checkWER) or
             (file_name.endswith(".dmp") and self.checkDmp) or
             (file_name.endswith(".evtx") and self.checkEVTx) or
-            (file_name.endswith(".log") and self.checkLog) or
+            (logextractor.compressed_logs.is_log_file_name(file_name) and self.checkLog) or
             (self.wsu_patt.match(file_name) is not None and self.checkWSU)):
 
-            # Get all file artifacts
-            skCase = Case.getCurrentCase().getSleuthkitCase()
+            file_path = file.getUniquePath()
 
-            # Get one list at a time and append them
+            # Files processed by a previous run with the same size, date and
+            # settings are skipped, the changed ones are processed again
+            settings_fingerprint = (self.log_settings_fingerprint
+                                    if logextractor.compressed_logs.is_log_file_name(file_name) else '')
+            ledger_state = LEDGER_NEW
+            if self.ledger is not None:
+                ledger_state = self.ledger.check(file, settings_fingerprint)
+            if ledger_state == LEDGER_UNCHANGED:
+                self.log(Level.INFO, "File did not change since it was processed "+file_path)
+                return IngestModule.ProcessResult.OK
+            # The artifacts of the previous run go first, or there would be two sets
+            if ledger_state == LEDGER_CHANGED and not self.remove_extracted_artifacts(file):
+                self.log(Level.WARNING, "File changed since it was processed but its "
+                         "artifacts could not be removed, skipped "+file_path)
+                return IngestModule.ProcessResult.OK
 
+            # Artifact type of the file
             if file_name.endswith(".wer"):
                 generic_art = self.art_wer_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_wer_file.getTypeID())
-            elif file_name.endswith(".log"):
+            elif logextractor.compressed_logs.is_log_file_name(file_name):
                 generic_art = self.art_log_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_log_file.getTypeID())
             elif file_name.endswith(".dmp"):
                 generic_art = self.art_dmp_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_dmp_file.getTypeID())
             elif file_name.endswith(".etl"):
                 generic_art = self.art_etl_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_etl_file.getTypeID())
             elif file_name.endswith(".evtx"):
                 generic_art = self.art_evt_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_evt_file.getTypeID())
             elif self.wsu_patt.match(file_name):
                 generic_art = self.art_windows_startup_file
-                artifact_list = skCase.getBlackboardArtifacts(
-                    self.art_windows_startup_file.getTypeID())
-
-            file_path = file.getUniquePath()
 
-            for artifact in artifact_list:
-                # Check if file is already an artifact
-                # If the files have the same name and parent path (this path already has the datasource), file is repeated
-                if artifact.getAttribute(self.att_case_file_path) != None and artifact.getAttribute(self.att_case_file_path).getValueString() == file_path:
-                    self.log(
-                        Level.INFO, "File is already in artifact list "+file_path)
-                    return IngestModule.ProcessResult.OK
+            # Check if file is already an artifact
+            # If the files have the same name and parent path (this path already has the datasource), file is repeated
+            # A changed file already has its file artifact
+            if (not self.registered_paths.add(generic_art.getTypeID(), file_path) and
+                    ledger_state == LEDGER_NEW):
+                self.log(
+                    Level.INFO, "File is already in artifact list "+file_path)
+                self.record_processed(file, settings_fingerprint)
+                return IngestModule.ProcessResult.OK
 
             self.filesFound += 1
+            # False once part of the file could not be extracted
+            extraction_complete = True
 
             #  Exclusive zone
             lock = threading.Lock()
@@ -477,31 +636,32 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             #                                |___/|_|              #
             # ######################################################
 
-            # Make an artifact
-            art = file.newArtifact(generic_art.getTypeID())
+            # Make an artifact, a changed file already has one
+            if ledger_state == LEDGER_NEW:
+                art = self.artifact_batch.new_artifact(file, generic_art)
 
-            # Register log file size
-            art.addAttribute(BlackboardAttribute(
-                self.att_log_size, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getSize()))
+                # Register log file size
+                art.addAttribute(BlackboardAttribute(
+                    self.att_log_size, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getSize()))
 
-            # Register creation date
-            art.addAttribute(BlackboardAttribute(
-                self.att_created_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getCrtime()))
+                # Register creation date
+                art.addAttribute(BlackboardAttribute(
+                    self.att_created_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getCrtime()))
 
-            # Register modified date
-            art.addAttribute(BlackboardAttribute(
-                self.att_modified_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getMtime()))
+                # Register modified date
+                art.addAttribute(BlackboardAttribute(
+                    self.att_modified_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getMtime()))
 
-            # Register creation date
-            art.addAttribute(BlackboardAttribute(
-                self.att_access_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getAtime()))
+                # Register creation date
+                art.addAttribute(BlackboardAttribute(
+                    self.att_access_time, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file.getAtime()))
 
-            # Register case file path
-            art.addAttribute(BlackboardAttribute(
-                self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
+                # Register case file path
+                art.addAttribute(BlackboardAttribute(
+                    self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
 
-            # Add the file log artifact
-            self.index_artifact(blackboard, art, generic_art)
+                # Add the file log artifact
+                self.artifact_batch.post(art)
 
             #####################################################################################################
             #  _____                                                             _    _   __              _     #
@@ -515,37 +675,42 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             #####################################################################################################
 
             if file_name.endswith(".wer"):
-                # Save the file locally in the temp folder and use file id as name to reduce collisions
-                self.temp_wer_path = os.path.join(
-                    self.temp_dir + WER_FOLDER_PATH, str(file.getId()))
-                try:
-                    ContentUtils.writeToFile(file, File(self.temp_wer_path))
-                except TskCoreException as e:
-                    self.log(Level.INFO, "TSK ERROR: " + str(e))
-                    return IngestModule.ProcessResult.OK
+                # The report is read straight from the evidence, no temp copy
+                wer_content = ContentFile(file)
 
-                # Get the parsed result
+                # Get the parsed result, or the one of a report with the same content
                 try:
-                    # Check if WER file is valid
-                    if not MSWExtractor.wer_extractor.is_file_wer(self.temp_wer_path):
+                    cache_key = self.result_cache.key('wer', wer_content.content_hash())
+                    cached = self.result_cache.get(cache_key)
+                    if cached is None:
+                        # Check if WER file is valid
+                        if not MSWExtractor.wer_extractor.is_file_wer(wer_content):
+                            cached = (False, None, None)
+                        else:
+                            # If valid, get the information and the dump file search result
+                            cached = (True,
+                                      MSWExtractor.wer_extractor.extract_default_keys(wer_content),
+                                      MSWExtractor.wer_extractor.find_dmp_files(wer_content))
+                        self.result_cache.put(cache_key, cached)
+                    is_valid, wer_info, dmp = cached
+
+                    if not is_valid:
                         # Add Invalid WER file artifact
                         self.create_invalid_wer_artifact(
-                            blackboard, file, file_path, "Invalid report")
+                            file, file_path, "Invalid report")
+                        self.record_processed(file, settings_fingerprint)
                         return IngestModule.ProcessResult.OK
-
-                    # If valid, get the information
-                    wer_info = MSWExtractor.wer_extractor.extract_default_keys(
-                        self.temp_wer_path)
                 except (Exception, JavaException) as e:
                     # Add Invalid WER file artifact
                     self.log(Level.INFO, "Not parseable WER: " + str(e))
                     self.create_invalid_wer_artifact(
-                        blackboard, file, file_path, "Could not parse the report")
+                        file, file_path, "Could not parse the report")
                     return IngestModule.ProcessResult.OK
+                finally:
+                    wer_content.close()
 
                 # Create new program artifact if .wer file is valid
-                reported_art = file.newArtifact(
-                    self.art_reported_program.getTypeID())
+                reported_art = self.artifact_batch.new_artifact(file, self.art_reported_program)
 
                 # Add normal attributes to artifact
                 reported_art.addAttribute(BlackboardAttribute(
@@ -563,10 +728,6 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                 reported_art.addAttribute(BlackboardAttribute(
                     self.att_windows_ver, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(wer_info['WindowsVersion'])))
 
-                # Adding dump file search result
-                dmp = MSWExtractor.wer_extractor.find_dmp_files(
-                    self.temp_wer_path)
-
                 if not dmp or "Error" in dmp:
                     dmp = "None"
                 else:
@@ -576,9 +737,7 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                     self.att_dump_files, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, dmp))
 
                 # Add artifact to Blackboard
-                self.index_artifact(blackboard, reported_art,
-                                    self.art_reported_program)
-                os.remove(self.temp_wer_path)
+                self.artifact_batch.post(reported_art)
 
             #################################################
             #     _                  __  _  _               #
@@ -591,34 +750,77 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             #               |___/                           #
             #################################################
 
-            if file_name.endswith(".log"):
-                # Save the file locally in the temp folder and use file id as name to reduce collisions
-                self.temp_log_path = os.path.join(
-                    self.temp_dir + LOG_FOLDER_PATH, str(file.getId()))
+            if logextractor.compressed_logs.is_log_file_name(file_name):
+                # The log is read straight from the evidence, no temp copy
+                # Compressed logs are decompressed while they are scanned
+                log_content = ContentFile(file)
+
+                # Search the IPs and the custom patterns inserted by the user
+                # All of them are looked up in a single pass over the file
+                check_ips = self.local_settings.getCheckLogIPs()
+                # Times of the IPs and matches, if the log has known timestamps
+                timeline = {} if self.checkTimeline else None
+                # MAC addresses and their vendors (eg: DHCP, WLAN AutoConfig, setupapi logs)
+                mac_info = [] if self.checkLogMACs else None
+                # RegExes that were stopped before the end of the log
+                incomplete = {}
+                compressed = logextractor.compressed_logs.is_compressed_log_name(file_name)
                 try:
-                    ContentUtils.writeToFile(file, File(self.temp_log_path))
-                except TskCoreException as e:
-                    self.log(Level.INFO, "TSK ERROR: " + str(e))
+                    # A log with the same content, read in the same way and
+                    # searched for the same things was already scanned
+                    cache_key = self.result_cache.key(
+                        'log', log_content.content_hash(),
+                        os.path.splitext(file_name)[1] if compressed else '',
+                        tuple(sorted(self.art_custom_regex.keys())), check_ips,
+                        tuple(self.protocols), self.checkTimeline, self.checkLogMACs)
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        ip_info, regex_info, timeline, mac_info = cached
+                    elif compressed:
+                        ip_info, regex_info = logextractor.log_extractor.scan_log_streams(
+                            logextractor.compressed_logs.iter_log_streams(log_content, file_name),
+                            self.art_custom_regex.keys(), check_ips,
+                            protocols=self.protocols, stats=self.scan_stats, ip_details=True,
+                            timeline=timeline, regex_guard=self.regex_guard, incomplete=incomplete,
+                            macs=mac_info)
+                    else:
+                        ip_info, regex_info = logextractor.log_extractor.scan_log_file(
+                            log_content, self.art_custom_regex.keys(), check_ips,
+                            protocols=self.protocols, stats=self.scan_stats, ip_details=True,
+                            timeline=timeline, regex_guard=self.regex_guard, incomplete=incomplete,
+                            macs=mac_info)
+                except Exception as e:
+                    self.log(Level.INFO, "Python ERROR: " +
+                             str(e) + " at file: " + file.getName())
                     return IngestModule.ProcessResult.OK
-
-                # Search with the custom patterns inserted by the user
-                for regex in self.art_custom_regex:
-                    # Get the parsed result
-                    try:
-                        log_info = logextractor.log_extractor.extract_custom_regex(
-                            self.temp_log_path, regex)
-                    except Exception as e:
-                        self.log(Level.INFO, "Python ERROR: " +
-                                 str(e) + " at file: " + file.getName())
-                        return IngestModule.ProcessResult.OK
-                    except JavaException as e:
-                        self.log(Level.INFO, "Java ERROR: " +
-                                 e.getMessage() + " at file: " + file.getName())
-                        return IngestModule.ProcessResult.OK
-
+                except JavaException as e:
+                    self.log(Level.INFO, "Java ERROR: " +
+                             e.getMessage() + " at file: " + file.getName())
+                    return IngestModule.ProcessResult.OK
+                finally:
+                    log_content.close()
+
+                # Results cut short by the RegEx time budget are not reused
+                if cached is None and not incomplete:
+                    self.result_cache.put(cache_key, (ip_info, regex_info, timeline, mac_info))
+
+                ip_times = timeline.get('ips', {}) if timeline else {}
+                mac_times = timeline.get('macs', {}) if timeline else {}
+                regex_times = timeline.get('regexes', {}) if timeline else {}
+
+                if incomplete:
+                    extraction_complete = False
+                for regex, reason in incomplete.iteritems():
+                    if reason == logextractor.log_extractor.REGEX_OUT_OF_TIME:
+                        self.log(Level.WARNING, "RegEx " + regex + " ran out of time at file: " + file.getName())
+                    # Report it even if it found nothing before being stopped,
+                    # or was not used at all (degraded)
+                    if not regex_info[regex]:
+                        regex_info[regex]['N/A'] = 0
+
+                for regex, log_info in regex_info.iteritems():
                     for occurrence, counter in log_info.iteritems():
-                        art = file.newArtifact(
-                            self.art_custom_regex[regex].getTypeID())
+                        art = self.artifact_batch.new_artifact(file, self.art_custom_regex[regex])
 
                         art.addAttribute(BlackboardAttribute(
                             self.att_custom_match, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(occurrence)))
@@ -626,32 +828,29 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                             self.att_ip_counter, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(counter)))
                         art.addAttribute(BlackboardAttribute(
                             self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
+                        self.add_time_attributes(
+                            art, regex_times.get(regex, {}).get(occurrence))
+                        # Not every line of the log was searched
+                        if incomplete.get(regex) == logextractor.log_extractor.REGEX_OUT_OF_TIME:
+                            art.addAttribute(BlackboardAttribute(
+                                self.att_incomplete, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName,
+                                "Stopped after " + str(self.regex_guard.time_budget) + "s"))
+                        elif incomplete.get(regex) == logextractor.log_extractor.REGEX_DEGRADED:
+                            art.addAttribute(BlackboardAttribute(
+                                self.att_incomplete, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName,
+                                "Degraded: skipped after " + str(self.regex_guard.max_overruns) +
+                                " budget overruns"))
 
                         # Add artifact to Blackboard
-                        self.index_artifact(
-                            blackboard, art, self.art_custom_regex[regex])
-
-                if self.local_settings.getCheckLogIPs():
-                    # Get the parsed result
-                    try:
-                        log_info = logextractor.log_extractor.extract_ip_addresses(
-                            self.temp_log_path)
-                    except (IOError, StandardError) as e:
-                        self.log(Level.INFO, "Python ERROR: " +
-                                 str(e) + " at file: " + file.getName())
-                        return IngestModule.ProcessResult.OK
-                    except JavaException as e:
-                        self.log(Level.INFO, "Java ERROR: " +
-                                 e.getMessage() + " at file: " + file.getName())
-                        return IngestModule.ProcessResult.OK
+                        self.artifact_batch.post(art)
 
+                if check_ips:
                     # An ad hoc log can have multiple artifacts
                     # As long as it has more than one IP address registered
                     # So let's iterate over the dictionary
-                    for (ip, protocol, counter) in log_info:
+                    for (ip, protocol, counter, first_offset, last_offset, samples) in ip_info:
                         # Create artifact
-                        ip_art = file.newArtifact(
-                            self.art_logged_ip.getTypeID())
+                        ip_art = self.artifact_batch.new_artifact(file, self.art_logged_ip)
 
                         # Add IP type
                         ip_type = self.get_ip_type(ip)
@@ -659,18 +858,20 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                             self.att_ip_type, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, ip_type))
 
                         # Add current domain
+                        # Unknown public IPs are looked up in the background,
+                        # their domain is added when the thread shuts down
                         if ip_type == 'Public':
-                            try:
-                                domain = socket.gethostbyaddr(ip)[0]
-                                ip_domain = 'Same as IP' if domain == ip else domain
-                            except socket.herror as e:
-                                ip_domain = 'Error: ' + e
+                            ip_domain = self.dns_resolver.cached(ip)
+                            if ip_domain is None:
+                                self.dns_resolver.submit(ip)
+                                self.pending_domains.append((ip_art, ip))
                         else:
                             ip_domain = 'N/A'
-                        ip_art.addAttribute(BlackboardAttribute(
-                            self.att_ip_domain, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, ip_domain))
+                        if ip_domain is not None:
+                            ip_art.addAttribute(BlackboardAttribute(
+                                self.att_ip_domain, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, ip_domain))
                         # Add IP version
-                        ip_version = "IPv" + str(netaddr.IPAddress(ip).version)
+                        ip_version = "IPv" + str(logextractor.log_extractor.get_ip_info(ip).version)
                         ip_art.addAttribute(BlackboardAttribute(
                             self.att_ip_version, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, ip_version))
 
@@ -686,14 +887,62 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                         ip_art.addAttribute(BlackboardAttribute(
                             self.att_ip_counter, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(counter)))
 
+                        # Add where the IP was first and last seen, so the lines
+                        # can be found with a seek instead of scanning the log again
+                        # (offsets of compressed logs are in the decompressed content)
+                        ip_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_first_offset, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(first_offset)))
+                        ip_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_last_offset, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(last_offset)))
+
+                        # Add a few sample lines, one per line with their offsets
+                        # eg: "[1024] 10.0.0.1 - - GET /index.html"
+                        sample_lines = u'\n'.join(u'[' + str(offset) + u'] ' + line.decode('utf-8', 'replace')
+                                                   for offset, line in samples)
+                        ip_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_samples, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, sample_lines))
+
+                        # Add first seen, last seen and occurrences per hour
+                        self.add_time_attributes(
+                            ip_art, ip_times.get((ip, protocol)))
+
                         # Add file path to artifact
                         ip_art.addAttribute(BlackboardAttribute(
                             self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
 
                         # Add artifact to Blackboard
-                        self.index_artifact(
-                            blackboard, ip_art, self.art_logged_ip)
-                os.remove(self.temp_log_path)
+                        self.artifact_batch.post(ip_art)
+
+                if self.checkLogMACs:
+                    # One artifact for each different MAC address in the log
+                    # The vendor comes from the IEEE OUI and IAB registries
+                    for (mac, vendor, counter, first_offset, last_offset, samples) in mac_info:
+                        mac_art = self.artifact_batch.new_artifact(file, self.art_logged_mac)
+
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_mac_address, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, mac))
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_mac_vendor, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, vendor))
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_counter, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(counter)))
+
+                        # Where the MAC address was first and last seen, and a few sample lines
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_first_offset, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(first_offset)))
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_last_offset, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, Long(last_offset)))
+                        sample_lines = u'\n'.join(u'[' + str(offset) + u'] ' + line.decode('utf-8', 'replace')
+                                                   for offset, line in samples)
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_ip_samples, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, sample_lines))
+
+                        self.add_time_attributes(mac_art, mac_times.get(mac))
+
+                        mac_art.addAttribute(BlackboardAttribute(
+                            self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
+
+                        # Add artifact to Blackboard
+                        self.artifact_batch.post(mac_art)
 
             ######################################################################################
             #          _______             _______ _________ _        _______  _______           #
@@ -709,17 +958,15 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
             # WSU RegEx and doesn't have -slack on the name
             # Files ending in -slack are not readable in the same way
             if self.wsu_patt.match(file_name) is not None and "-slack" not in file_name:
-                self.temp_wsu_path = os.path.join(
-                    self.temp_dir + WSU_FOLDER_PATH, str(file.getId()))
+                # The XML is read straight from the evidence, no temp copy
+                wsu_content = ContentFile(file)
                 try:
-                    ContentUtils.writeToFile(file, File(self.temp_wsu_path))
-                except TskCoreException as e:
-                    self.log(Level.INFO, "TSK ERROR: " + str(e))
-                    return IngestModule.ProcessResult.OK
-
-                try:
-                    wsu_info = MSWExtractor.startup_extractor.parse_startup_info(
-                        self.temp_wsu_path)
+                    cache_key = self.result_cache.key('wsu', wsu_content.content_hash())
+                    wsu_info = self.result_cache.get(cache_key)
+                    if wsu_info is None:
+                        wsu_info = MSWExtractor.startup_extractor.parse_startup_info(
+                            wsu_content)
+                        self.result_cache.put(cache_key, wsu_info)
                 except Exception as e:
                     self.log(Level.INFO, "WSU Python ERROR: " +
                              str(e) + " at file: " + file.getName())
@@ -728,10 +975,11 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                     self.log(Level.INFO, "WSU Java ERROR: " +
                              e.getMessage() + " at file: " + file.getName())
                     return IngestModule.ProcessResult.OK
+                finally:
+                    wsu_content.close()
 
                 for process in wsu_info:
-                    art = file.newArtifact(
-                        self.art_windows_startup_info.getTypeID())
+                    art = self.artifact_batch.new_artifact(file, self.art_windows_startup_info)
 
                     art.addAttribute(BlackboardAttribute(
                         self.att_wsu_process_name, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, str(process.process_name)))
@@ -767,20 +1015,117 @@ class LogForensicsForAutopsyFileIngestModuleWithUI(FileIngestModule):
                         self.att_case_file_path, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName, file_path))
 
                     # Add artifact to Blackboard
-                    self.index_artifact(
-                        blackboard, art, self.art_windows_startup_info)
-                os.remove(self.temp_wsu_path)
+                    self.artifact_batch.post(art)
+
+            # A file left incomplete (eg: a RegEx out of time or degraded) is
+            # not taken as processed, but its artifacts are replaced next time
+            self.record_processed(file, settings_fingerprint if extraction_complete
+                                  else LEDGER_INCOMPLETE)
 
         return IngestModule.ProcessResult.OK
 
+    def fill_domains(self):
+        # Domains of the public IPs that were not known when their artifacts were made
+        # Each lookup is waited for up to the resolver timeout from when it
+        # started, and all of them up to DNS_DRAIN_TIMEOUT
+        deadline = time.time() + logextractor.reverse_dns.DNS_DRAIN_TIMEOUT
+        artifacts = []
+        for ip_art, ip in self.pending_domains:
+            # The artifact could not be created
+            if ip_art.artifact is None:
+                continue
+            ip_art.artifact.addAttribute(BlackboardAttribute(
+                self.att_ip_domain, LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName,
+                self.dns_resolver.result(ip, deadline)))
+            artifacts.append(ip_art.artifact)
+        self.pending_domains = []
+        if artifacts:
+            self.artifact_batch.index(self.art_logged_ip, artifacts)
+
+    def create_dns_resolver(self, case_directory):
+        hosts = {}
+        hosts_file = self.local_settings.getHostsFile()
+        if hosts_file:
+            try:
+                hosts = logextractor.reverse_dns.read_hosts_file(hosts_file)
+            except IOError as e:
+                self.log(Level.WARNING, "Could not read the hosts file: " + str(e))
+        offline = self.local_settings.getOfflineDNS()
+        cache = None
+        if not offline:
+            try:
+                cache = DNSCache(case_directory)
+            except SQLException as e:
+                self.log(Level.WARNING, "Could not open the reverse DNS cache: " + str(e))
+        return logextractor.reverse_dns.ReverseDNSResolver(cache, hosts, offline)
+
+    def close_dns_resolver(self, resolver):
+        # Lookups still running for another job are given up
+        resolver.close()
+        if resolver.cache is not None:
+            try:
+                resolver.cache.close()
+            except SQLException as e:
+                self.log(Level.WARNING, "Could not update the reverse DNS cache: " + str(e))
+
+    def remove_extracted_artifacts(self, file):
+        # Deletes the artifacts made from the content of the file by a previous run
+        # False if they could not be deleted (or this Autopsy can't delete artifacts)
+        delete_artifact = get_artifact_deleter()
+        if delete_artifact is None:
+            return False
+        try:
+            for artifact in file.getAllArtifacts():
+                if is_extracted_artifact_type(artifact.getArtifactTypeName()):
+                    delete_artifact(artifact)
+        except TskCoreException as e:
+            self.log(Level.WARNING, "Could not remove the artifacts of " +
+                     file.getName() + ": " + str(e))
+            return False
+        return True
+
+    def record_processed(self, file, settings_fingerprint):
+        # Files left out by a failed extraction are tried again on the next run
+        # The record is written after the artifacts of the file are posted
+        self.artifact_batch.record(file, settings_fingerprint)
+
     # Where any shutdown code is run and resources are freed.
     def shutDown(self):
+        # Post the artifacts still waiting before they are counted
+        self.artifact_batch.flush()
+        self.fill_domains()
+
         elapsed_time = time.time() - self.start_time
         self.log(Level.INFO, "Thread name: " + threading.current_thread().name)
         self.log(Level.INFO, "This thread lasted: " +
                  str(round(elapsed_time, 1))+"s")
         self.log(Level.INFO, "Files found by this thread: " +
                  str(self.filesFound))
+        self.log(Level.INFO, "Log lines scanned by this thread: " +
+                 str(self.scan_stats))
+        self.log(Level.INFO, "IP cache: " +
+                 str(logextractor.log_extractor.IP_INFO_CACHE.stats()))
+        self.log(Level.INFO, "Result cache: " + str(self.result_cache.stats()))
+        self.log(Level.INFO, "Artifacts posted: " + str(self.artifact_batch.stats()))
+        self.log(Level.INFO, "Reverse DNS: " + str(self.dns_resolver.stats()))
+        if self.dns_resolver.cache is not None:
+            try:
+                self.dns_resolver.cache.flush()
+            except SQLException as e:
+                self.log(Level.WARNING, "Could not update the reverse DNS cache: " + str(e))
+        if self.ledger is not None:
+            try:
+                self.ledger.flush()
+            except SQLException as e:
+                self.log(Level.WARNING, "Could not update the ingest ledger: " + str(e))
+            self.log(Level.INFO, "Ingest ledger: " + str(self.ledger.stats()))
+        for regex in self.regex_guard.degraded_regexes():
+            self.log(Level.WARNING, "RegEx " + regex + " was degraded, it ran out of time too often")
+        # The threads still running keep their reference to the guard
+        with G_regex_guards_lock:
+            G_regex_guards.pop(self.job_id, None)
+        with G_registered_paths_lock:
+            G_registered_paths.pop(self.job_id, None)
 
         lock = threading.Lock()
         lock.acquire()
@@ -832,7 +1177,19 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettings(IngestModuleIngestJob
     serialVersionUID = 1L
 
     def __init__(self):
-        pass
+        # Protocols looked up in the lines where IPs are found
+        self.protocols = list(logextractor.log_extractor.PROTOCOLS)
+        # If the times of the IPs and matches are taken from the log timestamps
+        self.checkTimeline = False
+        # Artifacts posted to the blackboard at a time, and the longest they wait (s)
+        self.artifactBatchSize = ARTIFACT_BATCH_SIZE
+        self.artifactFlushInterval = ARTIFACT_FLUSH_INTERVAL
+        # If the IP domains only come from the hosts file, for air-gapped workstations
+        self.offlineDNS = False
+        # Hosts or DNS zone file with known IP names, empty for none
+        self.hostsFile = ''
+        # If the MAC addresses in the logs are extracted, with their vendors
+        self.checkLogMACs = False
 
     def getVersionNumber(self):
         return serialVersionUID
@@ -885,6 +1242,48 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettings(IngestModuleIngestJob
     def setCheckWSU(self, checkWSU):
         self.checkWSU = checkWSU
 
+    def getProtocols(self):
+        return self.protocols
+
+    def setProtocols(self, protocols):
+        self.protocols = protocols
+
+    def getCheckTimeline(self):
+        return self.checkTimeline
+
+    def setCheckTimeline(self, checkTimeline):
+        self.checkTimeline = checkTimeline
+
+    def getArtifactBatchSize(self):
+        return self.artifactBatchSize
+
+    def setArtifactBatchSize(self, artifactBatchSize):
+        self.artifactBatchSize = artifactBatchSize
+
+    def getArtifactFlushInterval(self):
+        return self.artifactFlushInterval
+
+    def setArtifactFlushInterval(self, artifactFlushInterval):
+        self.artifactFlushInterval = artifactFlushInterval
+
+    def getOfflineDNS(self):
+        return self.offlineDNS
+
+    def setOfflineDNS(self, offlineDNS):
+        self.offlineDNS = offlineDNS
+
+    def getHostsFile(self):
+        return self.hostsFile
+
+    def setHostsFile(self, hostsFile):
+        self.hostsFile = hostsFile
+
+    def getCheckLogMACs(self):
+        return self.checkLogMACs
+
+    def setCheckLogMACs(self, checkLogMACs):
+        self.checkLogMACs = checkLogMACs
+
 # UI that is shown to user for each ingest job so they can configure the job.
 
 
@@ -930,10 +1329,57 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         self.local_settings.setCheckLogIPs(self.checkboxLogIPs.isSelected())
         self.saveFlagSetting("checkLogIPs", self.checkboxLogIPs.isSelected())
 
+    def checkBoxEventLogMACs(self, event):
+        self.local_settings.setCheckLogMACs(self.checkboxLogMACs.isSelected())
+        self.saveFlagSetting("checkLogMACs", self.checkboxLogMACs.isSelected())
+
+    def checkBoxEventTimeline(self, event):
+        self.local_settings.setCheckTimeline(self.checkboxTimeline.isSelected())
+        self.saveFlagSetting("checkTimeline", self.checkboxTimeline.isSelected())
+
     def checkBoxEventWSU(self, event):
         self.local_settings.setCheckWSU(self.checkboxWSU.isSelected())
         self.saveFlagSetting("checkWSU", self.checkboxWSU.isSelected())
 
+    def checkBoxEventOfflineDNS(self, event):
+        self.local_settings.setOfflineDNS(self.checkboxOfflineDNS.isSelected())
+        self.saveFlagSetting("offlineDNS", self.checkboxOfflineDNS.isSelected())
+
+    def browseHostsFile(self, event):
+        chooser = JFileChooser()
+        chooser.setDialogTitle("Hosts or DNS zone file")
+        if chooser.showOpenDialog(self) != JFileChooser.APPROVE_OPTION:
+            return
+        self.textFieldHostsFile.setText(chooser.getSelectedFile().getAbsolutePath())
+        self.saveHostsFile(event)
+
+    def saveHostsFile(self, event):
+        # An empty path for no hosts file
+        hosts_file = self.textFieldHostsFile.getText().strip()
+        self.textFieldHostsFile.setText(hosts_file)
+        self.local_settings.setHostsFile(hosts_file)
+        self.saveTextSetting("hostsFile", hosts_file)
+
+    def saveArtifactBatch(self, event):
+        # Whole numbers, at least one artifact at a time
+        try:
+            batch_size = int(self.textFieldArtifactBatchSize.getText().strip())
+            flush_interval = int(self.textFieldArtifactFlushInterval.getText().strip())
+        except ValueError:
+            batch_size = flush_interval = -1
+        if batch_size < 1 or flush_interval < 0:
+            self.textFieldArtifactBatchSize.setText(str(self.local_settings.getArtifactBatchSize()))
+            self.textFieldArtifactFlushInterval.setText(str(self.local_settings.getArtifactFlushInterval()))
+            self.labelErrorMessage.setText(
+                "The batch size must be a whole number from 1, the interval from 0 seconds")
+            return
+        self.textFieldArtifactBatchSize.setText(str(batch_size))
+        self.textFieldArtifactFlushInterval.setText(str(flush_interval))
+        self.local_settings.setArtifactBatchSize(batch_size)
+        self.local_settings.setArtifactFlushInterval(flush_interval)
+        self.saveNumberSetting("artifactBatchSize", batch_size)
+        self.saveNumberSetting("artifactFlushInterval", flush_interval)
+
     def updateGlobalRegexList(self):
         self.local_settings.setRegexList(self.regex_list)
 
@@ -950,6 +1396,14 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
             self.textFieldRegex.setText("")
             self.textFieldRegexName.setText("")
             self.updateGlobalRegexList()
+
+            # Lines without the literals the RegEx needs are skipped while scanning
+            literals = logextractor.log_extractor.required_literals(p)
+            if literals:
+                self.labelErrorMessage.setText(
+                    "RegEx added, only lines with " + " or ".join('"' + l + '"' for l in literals) + " are searched")
+            else:
+                self.labelErrorMessage.setText("RegEx added, every line is searched")
         except re.error:
             self.labelErrorMessage.setText("Could not compile that RegEx.")
 
@@ -961,6 +1415,17 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
     def saveRegexesToDB(self, event):
         self.saveRegexes()
 
+    def saveProtocolsToDB(self, event):
+        # Comma separated names, each one only once
+        protocols = []
+        for name in self.textFieldProtocols.getText().split(','):
+            name = name.strip()
+            if name and name.upper() not in [p.upper() for p in protocols]:
+                protocols.append(name)
+        self.textFieldProtocols.setText(', '.join(protocols))
+        self.local_settings.setProtocols(protocols)
+        self.saveProtocols()
+
     def clearList(self, event):
         self.regex_list.clear()
         self.updateGlobalRegexList()
@@ -971,6 +1436,47 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         self.updateGlobalRegexList()
         # self.updateRegexList()
 
+    def benchmarkRegexes(self, event):
+        # Runs the active RegExes over a sample log chosen by the user
+        # and shows their speed, match rate and possible backtracking
+        regexes = [regex for regex in self.regex_list.toArray() if regex.active]
+        if not regexes:
+            self.labelErrorMessage.setText("There are no active RegExes to benchmark")
+            return
+        chooser = JFileChooser()
+        chooser.setDialogTitle("Sample log for the benchmark")
+        if chooser.showOpenDialog(self) != JFileChooser.APPROVE_OPTION:
+            return
+        sample_path = chooser.getSelectedFile().getAbsolutePath()
+        self.labelErrorMessage.setText("Benchmarking " + str(len(regexes)) + " RegExes...")
+        self.buttonBenchmarkRegexes.setEnabled(False)
+
+        # Out of the Swing thread, a slow RegEx can take a while
+        # A RegEx that runs out of time is given up on and reported as timed out
+        def benchmark():
+            results = []
+            try:
+                for regex in regexes:
+                    try:
+                        results.append(regex.name + ' - ' + repr(
+                            logextractor.log_extractor.benchmark_regex(regex.regex, sample_path)))
+                    except (Exception, JavaException) as e:
+                        results.append(regex.name + ' - Error: ' + str(e))
+                SwingUtilities.invokeLater(lambda: self.showBenchmark(results))
+            finally:
+                SwingUtilities.invokeLater(lambda: self.buttonBenchmarkRegexes.setEnabled(True))
+
+        thread = threading.Thread(target=benchmark)
+        thread.daemon = True
+        thread.start()
+
+    def showBenchmark(self, results):
+        self.labelErrorMessage.setText("Benchmark finished")
+        text_area = JTextArea('\n'.join(results), 10, 60)
+        text_area.setEditable(False)
+        JOptionPane.showMessageDialog(self, JScrollPane(text_area), "RegEx benchmark",
+                                      JOptionPane.INFORMATION_MESSAGE)
+
     def initComponents(self):
         self.setLayout(BoxLayout(self, BoxLayout.Y_AXIS))
         self.setAlignmentX(JComponent.LEFT_ALIGNMENT)
@@ -998,9 +1504,13 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         self.labelAddRegex = JLabel("Add RegEx to .log files: ")
         self.labelAddRegexName = JLabel("Name: ")
         self.labelAddRegexRegex = JLabel(" RegEx: ")
+        self.labelProtocols = JLabel("Protocols in .log IP lines: ")
         self.labelErrorMessage = JLabel(" ")
         self.labelInfoMessage = JLabel(
-            "Internet access is required for domain lookup (.log IPs)")
+            "Domain lookup (.log IPs) needs Internet access, unless it is offline (hosts file only)")
+        self.labelHostsFile = JLabel("Hosts file: ")
+        self.labelArtifactBatchSize = JLabel("Artifacts posted at a time: ")
+        self.labelArtifactFlushInterval = JLabel(" or every (s): ")
         self.labelCheckText.setEnabled(True)
         self.labelInfoMessage.setEnabled(True)
         self.labelErrorMessage.setEnabled(True)
@@ -1018,8 +1528,14 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
             "Dmp", actionPerformed=self.checkBoxEventDmp)
         self.checkboxLogIPs = JCheckBox(
             "Check .log IPs", actionPerformed=self.checkBoxEventLogIPs)
+        self.checkboxLogMACs = JCheckBox(
+            "Check .log MAC addresses", actionPerformed=self.checkBoxEventLogMACs)
+        self.checkboxTimeline = JCheckBox(
+            "Build timeline (.log timestamps)", actionPerformed=self.checkBoxEventTimeline)
         self.checkboxWSU = JCheckBox(
             "Check Windows Startup XML", actionPerformed=self.checkBoxEventWSU)
+        self.checkboxOfflineDNS = JCheckBox(
+            "Offline domain lookup", actionPerformed=self.checkBoxEventOfflineDNS)
 
         self.buttonAddRegex = JButton(
             "Add", actionPerformed=self.addRegexToList)
@@ -1031,8 +1547,37 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
             "Clear", actionPerformed=self.clearList)
         self.buttonSaveRegexes = JButton(
             "Save", actionPerformed=self.saveRegexesToDB)
+        self.buttonBenchmarkRegexes = JButton(
+            "Benchmark", actionPerformed=self.benchmarkRegexes)
         self.buttonAddRegex.setEnabled(True)
 
+        self.textFieldProtocols = JTextField(20)
+        self.buttonSaveProtocols = JButton(
+            "Save", actionPerformed=self.saveProtocolsToDB)
+
+        panelProtocols = JPanel()
+        panelProtocols.setLayout(BoxLayout(panelProtocols, BoxLayout.X_AXIS))
+        panelProtocols.setAlignmentX(JComponent.LEFT_ALIGNMENT)
+
+        self.textFieldHostsFile = JTextField(20)
+        self.buttonBrowseHostsFile = JButton(
+            "Browse", actionPerformed=self.browseHostsFile)
+        self.buttonSaveHostsFile = JButton(
+            "Save", actionPerformed=self.saveHostsFile)
+
+        panelHostsFile = JPanel()
+        panelHostsFile.setLayout(BoxLayout(panelHostsFile, BoxLayout.X_AXIS))
+        panelHostsFile.setAlignmentX(JComponent.LEFT_ALIGNMENT)
+
+        self.textFieldArtifactBatchSize = JTextField(5)
+        self.textFieldArtifactFlushInterval = JTextField(3)
+        self.buttonSaveArtifactBatch = JButton(
+            "Save", actionPerformed=self.saveArtifactBatch)
+
+        panelArtifactBatch = JPanel()
+        panelArtifactBatch.setLayout(BoxLayout(panelArtifactBatch, BoxLayout.X_AXIS))
+        panelArtifactBatch.setAlignmentX(JComponent.LEFT_ALIGNMENT)
+
         self.textFieldRegex = JTextField(15)
         self.textFieldRegexName = JTextField(5)
 
@@ -1048,8 +1593,26 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         panelFiles.add(self.checkboxEVTx)
         self.add(panelFiles)
         self.add(self.checkboxLogIPs)
+        panelProtocols.add(self.labelProtocols)
+        panelProtocols.add(self.textFieldProtocols)
+        panelProtocols.add(self.buttonSaveProtocols)
+        self.add(panelProtocols)
+        self.add(self.checkboxLogMACs)
+        self.add(self.checkboxTimeline)
         self.add(self.checkboxWSU)
         self.add(self.labelInfoMessage)
+        self.add(self.checkboxOfflineDNS)
+        panelHostsFile.add(self.labelHostsFile)
+        panelHostsFile.add(self.textFieldHostsFile)
+        panelHostsFile.add(self.buttonBrowseHostsFile)
+        panelHostsFile.add(self.buttonSaveHostsFile)
+        self.add(panelHostsFile)
+        panelArtifactBatch.add(self.labelArtifactBatchSize)
+        panelArtifactBatch.add(self.textFieldArtifactBatchSize)
+        panelArtifactBatch.add(self.labelArtifactFlushInterval)
+        panelArtifactBatch.add(self.textFieldArtifactFlushInterval)
+        panelArtifactBatch.add(self.buttonSaveArtifactBatch)
+        self.add(panelArtifactBatch)
         gbc.fill = GridBagConstraints.HORIZONTAL
         self.panelAddRegex.add(self.labelAddRegex, gbc)
         panelRegexes.add(self.labelAddRegexName)
@@ -1065,6 +1628,7 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         panelRegexesButtons.add(self.buttonClearRegex)
         panelRegexesButtons.add(self.buttonSaveRegexes)
         panelRegexesButtons.add(self.buttonActivateRegex)
+        panelRegexesButtons.add(self.buttonBenchmarkRegexes)
         gbc.gridy = 4
         self.panelAddRegex.add(panelRegexesButtons, gbc)
         self.add(self.panelAddRegex)
@@ -1096,6 +1660,7 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
 
         try:
             stmt = dbConn.createStatement()
+            self.upgradeDatabase(stmt)
             query = 'SELECT * FROM settings WHERE id = 2;'
             resultSet = stmt.executeQuery(query)
             while resultSet.next():
@@ -1123,16 +1688,47 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
                     (resultSet.getInt("checkLogIPs") > 0))
                 self.checkboxLogIPs.setSelected(
                     (resultSet.getInt("checkLogIPs") > 0))
+                self.local_settings.setCheckLogMACs(
+                    (resultSet.getInt("checkLogMACs") > 0))
+                self.checkboxLogMACs.setSelected(
+                    (resultSet.getInt("checkLogMACs") > 0))
+                self.local_settings.setCheckTimeline(
+                    (resultSet.getInt("checkTimeline") > 0))
+                self.checkboxTimeline.setSelected(
+                    (resultSet.getInt("checkTimeline") > 0))
                 self.local_settings.setCheckWSU(
                     (resultSet.getInt("checkWSU") > 0))
                 self.checkboxWSU.setSelected(
                     (resultSet.getInt("checkWSU") > 0))
+                self.local_settings.setOfflineDNS(
+                    (resultSet.getInt("offlineDNS") > 0))
+                self.checkboxOfflineDNS.setSelected(
+                    (resultSet.getInt("offlineDNS") > 0))
+                self.local_settings.setHostsFile(
+                    resultSet.getString("hostsFile") or '')
+                self.textFieldHostsFile.setText(
+                    resultSet.getString("hostsFile") or '')
+                self.local_settings.setArtifactBatchSize(
+                    max(1, resultSet.getInt("artifactBatchSize")))
+                self.textFieldArtifactBatchSize.setText(
+                    str(self.local_settings.getArtifactBatchSize()))
+                self.local_settings.setArtifactFlushInterval(
+                    max(0, resultSet.getInt("artifactFlushInterval")))
+                self.textFieldArtifactFlushInterval.setText(
+                    str(self.local_settings.getArtifactFlushInterval()))
             query = 'SELECT * FROM regexes;'
             resultSet = stmt.executeQuery(query)
             while resultSet.next():
                 regex = Regex(resultSet.getString("name"), resultSet.getString(
                     "regex"), resultSet.getInt("active") > 0)
                 self.regex_list.addElement(regex)
+            query = 'SELECT * FROM protocols ORDER BY id;'
+            resultSet = stmt.executeQuery(query)
+            protocols = []
+            while resultSet.next():
+                protocols.append(resultSet.getString("name"))
+            self.local_settings.setProtocols(protocols)
+            self.textFieldProtocols.setText(', '.join(protocols))
             self.labelErrorMessage.setText("Settings read successfully!")
         except SQLException as e:
             self.labelErrorMessage.setText("Could not read settings: "+str(e))
@@ -1140,6 +1736,25 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         stmt.close()
         dbConn.close()
 
+    # Add what newer versions keep to a settings database of an older one
+    def upgradeDatabase(self, stmt):
+        resultSet = stmt.executeQuery('PRAGMA table_info(settings);')
+        columns = set()
+        while resultSet.next():
+            columns.add(resultSet.getString("name"))
+        for name, definition in SETTINGS_COLUMNS:
+            if name not in columns:
+                stmt.executeUpdate('ALTER TABLE settings ADD COLUMN ' + name + ' ' + definition + ';')
+
+        resultSet = stmt.executeQuery(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'protocols';")
+        if not resultSet.next():
+            stmt.executeUpdate('CREATE TABLE protocols ('
+                               'id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, '
+                               'name TEXT NOT NULL);')
+            for protocol in logextractor.log_extractor.PROTOCOLS:
+                stmt.executeUpdate("INSERT INTO protocols (name) VALUES ('" + protocol + "');")
+
     # Save ONE log flag
     def saveFlagSetting(self, flag, value):
         head, tail = os.path.split(os.path.abspath(__file__))
@@ -1165,6 +1780,50 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         stmt.close()
         dbConn.close()
 
+    # Save ONE number setting
+    def saveNumberSetting(self, name, value):
+        head, tail = os.path.split(os.path.abspath(__file__))
+        settings_db = head + DB_PATH
+        try:
+            Class.forName("org.sqlite.JDBC").newInstance()
+            dbConn = DriverManager.getConnection(
+                "jdbc:sqlite:%s" % settings_db)
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error opening settings")
+
+        try:
+            preparedStmt = dbConn.prepareStatement(
+                'UPDATE settings SET ' + name + ' = ? WHERE id = 2;')
+            preparedStmt.setInt(1, value)
+            preparedStmt.executeUpdate()
+            preparedStmt.close()
+            self.labelErrorMessage.setText("Saved setting")
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error saving settings "+str(e))
+        dbConn.close()
+
+    # Save ONE text setting
+    def saveTextSetting(self, name, value):
+        head, tail = os.path.split(os.path.abspath(__file__))
+        settings_db = head + DB_PATH
+        try:
+            Class.forName("org.sqlite.JDBC").newInstance()
+            dbConn = DriverManager.getConnection(
+                "jdbc:sqlite:%s" % settings_db)
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error opening settings")
+
+        try:
+            preparedStmt = dbConn.prepareStatement(
+                'UPDATE settings SET ' + name + ' = ? WHERE id = 2;')
+            preparedStmt.setString(1, value)
+            preparedStmt.executeUpdate()
+            preparedStmt.close()
+            self.labelErrorMessage.setText("Saved setting")
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error saving settings "+str(e))
+        dbConn.close()
+
     def saveRegexes(self):
         head, tail = os.path.split(os.path.abspath(__file__))
         settings_db = head + DB_PATH
@@ -1199,6 +1858,37 @@ class LogForensicsForAutopsyFileIngestModuleWithUISettingsPanel(IngestModuleInge
         preparedStmt.close()
         dbConn.close()
 
+    def saveProtocols(self):
+        head, tail = os.path.split(os.path.abspath(__file__))
+        settings_db = head + DB_PATH
+        try:
+            Class.forName("org.sqlite.JDBC").newInstance()
+            dbConn = DriverManager.getConnection(
+                "jdbc:sqlite:%s" % settings_db)
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error opening protocols")
+
+        try:
+            stmt = dbConn.createStatement()
+            query = 'DELETE FROM protocols;'
+            stmt.executeUpdate(query)
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error saving settings "+str(e))
+        try:
+            sql = "INSERT INTO protocols (name) values (?)"
+            preparedStmt = dbConn.prepareStatement(sql)
+            for protocol in self.local_settings.getProtocols():
+                preparedStmt.setString(1, protocol)
+                preparedStmt.addBatch()
+            preparedStmt.executeBatch()
+            self.labelErrorMessage.setText("Saved protocols")
+        except SQLException as e:
+            self.labelErrorMessage.setText("Error saving settings "+str(e))
+
+        stmt.close()
+        preparedStmt.close()
+        dbConn.close()
+
 
 class Regex(object):
     """Class for a Regex inserted by the user
@@ -1215,3 +1905,608 @@ class Regex(object):
     def __repr__(self):
         active = 'Active' if self.active else 'Inactive'
         return '['+str(active)+'] '+self.name+': '+self.regex
+
+
+class ResultCache(object):
+    """Bounded LRU cache of parsed results, keyed by the content hash of the files
+        Shared by all ingest threads and jobs of a case, a file that shows up
+        again only gets its own artifacts
+        case_directory: Directory of the case the results belong to (string)
+        max_size: Maximum number of results kept (int)
+        max_bytes: Maximum approximate size of the results kept (int)
+    """
+
+    def __init__(self, case_directory, max_size=RESULT_CACHE_SIZE,
+                 max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.case_directory = case_directory
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, content_hash, *parts):
+        # Key of the results of a file, None (not cached) if its content hash
+        # is not known
+        if content_hash is None:
+            return None
+        return (kind, content_hash) + parts
+
+    def get(self, key):
+        # The results are shared, they must not be changed
+        if key is None:
+            return None
+        with self._lock:
+            result = self._entries.pop(key, None)
+            if result is None:
+                self.misses += 1
+                return None
+            # Put it back as the most recently used
+            self._entries[key] = result
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        if key is None:
+            return
+        size = approximate_size(result)
+        with self._lock:
+            self._remove(key)
+            # A result bigger than the whole cache would only push the others out
+            if size > self.max_bytes:
+                return
+            self._entries[key] = result
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.max_size or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        # Called with the lock held
+        if self._entries.pop(key, None) is not None:
+            self._bytes -= self._sizes.pop(key)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def approximate_size(value):
+    # Rough number of bytes held by a result: the characters of its strings
+    # plus a few words for every object, containers and objects are walked
+    # (Jython has no sys.getsizeof)
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        size += 16
+        if isinstance(value, basestring):
+            size += len(value) * (2 if isinstance(value, unicode) else 1)
+        elif isinstance(value, dict):
+            size += 16 * len(value)
+            stack.extend(value.iterkeys())
+            stack.extend(value.itervalues())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += 8 * len(value)
+            stack.extend(value)
+        elif hasattr(value, '__dict__'):
+            stack.extend(vars(value).itervalues())
+    return size
+
+
+class TypeRegistry(object):
+    """Artifact and attribute types of a case, shared by all ingest threads
+        Each type is created and looked up in the case database once
+        case_directory: Directory of the case the types belong to (string)
+    """
+
+    def __init__(self, case_directory):
+        self.case_directory = case_directory
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._types.get(key)
+
+    def put(self, key, value):
+        # Types that could not be found are looked up again by the next thread
+        if value is None:
+            return None
+        with self._lock:
+            return self._types.setdefault(key, value)
+
+
+def is_extracted_artifact_type(type_name):
+    # True for the artifacts made from the content of a file (not its file artifact)
+    return (type_name in EXTRACTED_ARTIFACT_TYPES or
+            type_name.startswith(EXTRACTED_ARTIFACT_PREFIX))
+
+
+def get_artifact_deleter():
+    # Function that deletes an artifact, None if this Autopsy can't delete them
+    skCase = Case.getCurrentCase().getSleuthkitCase()
+    # Blackboard.deleteArtifact in newer versions of the datamodel
+    delete_artifact = None
+    if hasattr(skCase, 'getBlackboard'):
+        delete_artifact = getattr(skCase.getBlackboard(), 'deleteArtifact', None)
+    if delete_artifact is None:
+        delete_artifact = getattr(skCase, 'deleteBlackboardArtifact', None)
+    return delete_artifact
+
+
+class PendingArtifact(object):
+    """Artifact kept in memory until its batch is posted
+        file: File the artifact belongs to (AbstractFile)
+        art_type: Type of the artifact (BlackboardArtifact.Type)
+        attributes: Attributes of the artifact (list of BlackboardAttribute)
+        artifact: Artifact created when the batch was posted (BlackboardArtifact)
+    """
+
+    def __init__(self, file, art_type):
+        self.file = file
+        self.art_type = art_type
+        self.attributes = []
+        # The artifact in the case, once it is posted
+        self.artifact = None
+
+    def addAttribute(self, attribute):
+        self.attributes.append(attribute)
+
+
+class ArtifactBatch(object):
+    """Artifacts of an ingest thread waiting to be posted to the blackboard
+        They are created with all their attributes at once, indexed together
+        and announced with one event per artifact type. An artifact whose
+        attributes could not be added is deleted, not left empty
+        The files are recorded in the ledger only after the flush that
+        creates their artifacts, so a crash never leaves a file recorded
+        without them
+        blackboard: Blackboard used to index the artifacts (Blackboard)
+        log: Logging function of the ingest module
+        batch_size: Artifacts posted at a time (int)
+        flush_interval: Longest time (s) an artifact waits to be posted (int)
+        ledger: Ledger the processed files are recorded in, or None (IngestLedger)
+    """
+
+    def __init__(self, blackboard, log, batch_size=ARTIFACT_BATCH_SIZE,
+                 flush_interval=ARTIFACT_FLUSH_INTERVAL, ledger=None):
+        self.blackboard = blackboard
+        self.log = log
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.ledger = ledger
+        self.posted = 0
+        self.failed = 0
+        self.flushes = 0
+        self._pending = []
+        # (file, settings fingerprint) of the files whose artifacts are all posted
+        self._records = []
+        # File ID -> type names of its artifacts that could not be created
+        self._failed_types = {}
+        self._last_flush = time.time()
+
+    def new_artifact(self, file, art_type):
+        return PendingArtifact(file, art_type)
+
+    def post(self, artifact):
+        self._pending.append(artifact)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def record(self, file, settings_fingerprint):
+        # Called once all the artifacts of the file were posted
+        if self.ledger is None:
+            return
+        self._records.append((file, settings_fingerprint))
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if ((self._pending or self._records) and
+                time.time() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        pending = self._pending
+        self._last_flush = time.time()
+        if not pending and not self._records:
+            return
+
+        # Type ID -> (type, artifacts created)
+        created = OrderedDict()
+        for pending_artifact in pending:
+            # Already created by a flush that was interrupted
+            if pending_artifact.artifact is not None:
+                continue
+            art_type = pending_artifact.art_type
+            artifact = None
+            try:
+                artifact = pending_artifact.file.newArtifact(art_type.getTypeID())
+                # All the attributes are written in a single transaction
+                artifact.addAttributes(ArrayList(pending_artifact.attributes))
+            except TskCoreException as e:
+                # An artifact left without its attributes is deleted
+                if artifact is not None:
+                    self.delete(artifact)
+                # The other artifacts of the batch are still created
+                self.failed += 1
+                self.log(Level.SEVERE, "Error creating artifact " + art_type.getDisplayName() +
+                         " for file " + pending_artifact.file.getName() + ": " + str(e))
+                if self.ledger is not None:
+                    self._failed_types.setdefault(
+                        pending_artifact.file.getId(), []).append(art_type.getTypeName())
+                continue
+            pending_artifact.artifact = artifact
+            created.setdefault(art_type.getTypeID(), (art_type, ArrayList()))[1].add(artifact)
+            self.posted += 1
+        # Only cleared once all of them were tried
+        self._pending = []
+
+        for art_type, artifacts in created.itervalues():
+            self.index(art_type, artifacts)
+        self._write_records()
+
+        self.flushes += 1
+
+    def delete(self, artifact):
+        delete_artifact = get_artifact_deleter()
+        if delete_artifact is None:
+            self.log(Level.SEVERE, "Artifact " + artifact.getDisplayName() +
+                     " left without attributes, this Autopsy can't delete artifacts")
+            return
+        try:
+            delete_artifact(artifact)
+        except TskCoreException as e:
+            self.log(Level.SEVERE, "Could not delete artifact " + artifact.getDisplayName() +
+                     " left without attributes: " + str(e))
+
+    def _write_records(self):
+        records = self._records
+        self._records = []
+        if not records:
+            return
+        try:
+            for file, settings_fingerprint in records:
+                failed_types = self._failed_types.pop(file.getId(), None)
+                if failed_types is None:
+                    self.ledger.record(file, settings_fingerprint)
+                elif all(is_extracted_artifact_type(t) for t in failed_types):
+                    # Its artifacts are replaced and extracted again next time
+                    self.ledger.record(file, LEDGER_INCOMPLETE)
+                # Without its file artifact, it is processed as a new file next time
+            self.ledger.flush()
+        except SQLException as e:
+            self.log(Level.WARNING, "Could not update the ingest ledger: " + str(e))
+
+    def index(self, art_type, artifacts):
+        # Also used for artifacts that got new attributes after being posted
+        for artifact in artifacts:
+            try:
+                # Index the artifact for keyword search
+                self.blackboard.indexArtifact(artifact)
+            except Blackboard.BlackboardException as e:
+                self.log(Level.SEVERE, "Error indexing artifact " +
+                         artifact.getDisplayName())
+        # Fire an event to notify the UI and others that there are new artifacts
+        IngestServices.getInstance().fireModuleDataEvent(
+            ModuleDataEvent(LogForensicsForAutopsyFileIngestModuleWithUIFactory.moduleName,
+                            art_type, artifacts))
+
+    def stats(self):
+        return {'artifacts': self.posted, 'failed': self.failed, 'flushes': self.flushes}
+
+
+class RegisteredPaths(object):
+    """Set of the files with a file artifact, by artifact type and unique path
+        Replaces walking all the artifacts of a type for every file found
+    """
+
+    def __init__(self):
+        self._paths = set()
+        self._lock = threading.Lock()
+
+    def add(self, type_id, path):
+        # False if the path was already there
+        with self._lock:
+            key = (type_id, path)
+            if key in self._paths:
+                return False
+            self._paths.add(key)
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._paths)
+
+
+class IngestLedger(object):
+    """Record of the files processed in a case, kept in the case directory
+        Reruns skip the files that did not change, the ledger is read once
+        and new records are written in batches
+        case_directory: Directory of the case (string)
+        batch_size: Records written to the database at a time (int)
+    """
+
+    def __init__(self, case_directory, batch_size=LEDGER_BATCH_SIZE):
+        self.case_directory = case_directory
+        self.batch_size = batch_size
+        self.skipped = 0
+        self.changed = 0
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        Class.forName("org.sqlite.JDBC").newInstance()
+        self._conn = DriverManager.getConnection(
+            "jdbc:sqlite:%s" % os.path.join(case_directory, LEDGER_DB_NAME))
+        stmt = self._conn.createStatement()
+        try:
+            stmt.executeUpdate('CREATE TABLE IF NOT EXISTS processed_files ('
+                               'obj_id INTEGER PRIMARY KEY, size INTEGER, mtime INTEGER, '
+                               'md5 TEXT, version TEXT, settings TEXT);')
+            # Object ID -> (size, mtime, md5, version, settings)
+            self._files = {}
+            resultSet = stmt.executeQuery('SELECT * FROM processed_files;')
+            while resultSet.next():
+                self._files[resultSet.getLong("obj_id")] = (
+                    resultSet.getLong("size"), resultSet.getLong("mtime"),
+                    resultSet.getString("md5"), resultSet.getString("version"),
+                    resultSet.getString("settings"))
+        finally:
+            stmt.close()
+
+        self._conn.setAutoCommit(False)
+        self._insert = self._conn.prepareStatement(
+            'INSERT OR REPLACE INTO processed_files (obj_id, size, mtime, md5, version, settings) '
+            'VALUES (?, ?, ?, ?, ?, ?);')
+
+    def check(self, file, settings_fingerprint):
+        # LEDGER_NEW, LEDGER_UNCHANGED or LEDGER_CHANGED
+        with self._lock:
+            entry = self._files.get(file.getId())
+            if entry is None:
+                return LEDGER_NEW
+            size, mtime, md5, version, settings = entry
+            current_md5 = file.getMd5Hash()
+            if (size == file.getSize() and mtime == file.getMtime() and
+                    version == EXTRACTOR_VERSION and settings == settings_fingerprint and
+                    not (md5 and current_md5 and md5 != current_md5.lower())):
+                self.skipped += 1
+                return LEDGER_UNCHANGED
+            self.changed += 1
+            return LEDGER_CHANGED
+
+    def record(self, file, settings_fingerprint):
+        md5 = file.getMd5Hash()
+        md5 = md5.lower() if md5 else None
+        with self._lock:
+            self._files[file.getId()] = (file.getSize(), file.getMtime(), md5,
+                                         EXTRACTOR_VERSION, settings_fingerprint)
+            self._insert.setLong(1, file.getId())
+            self._insert.setLong(2, file.getSize())
+            self._insert.setLong(3, file.getMtime())
+            self._insert.setString(4, md5)
+            self._insert.setString(5, EXTRACTOR_VERSION)
+            self._insert.setString(6, settings_fingerprint)
+            self._insert.addBatch()
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write()
+
+    def _write(self):
+        # Called with the lock held
+        self._pending = 0
+        self._insert.executeBatch()
+        self._conn.commit()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._insert.close()
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {'files': len(self._files), 'skipped': self.skipped, 'changed': self.changed}
+
+
+class DNSCache(object):
+    """Reverse DNS answers of a case, kept in the case directory
+        Addresses that had no name are looked up again after a day
+        case_directory: Directory of the case (string)
+        batch_size: Answers written to the database at a time (int)
+    """
+
+    def __init__(self, case_directory, batch_size=LEDGER_BATCH_SIZE):
+        self.case_directory = case_directory
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        Class.forName("org.sqlite.JDBC").newInstance()
+        self._conn = DriverManager.getConnection(
+            "jdbc:sqlite:%s" % os.path.join(case_directory, DNS_CACHE_DB_NAME))
+        stmt = self._conn.createStatement()
+        try:
+            stmt.executeUpdate('CREATE TABLE IF NOT EXISTS reverse_dns ('
+                               'ip TEXT PRIMARY KEY, domain TEXT, resolved INTEGER);')
+            # IP -> (domain, when it was resolved)
+            self._domains = {}
+            resultSet = stmt.executeQuery('SELECT * FROM reverse_dns;')
+            while resultSet.next():
+                self._domains[resultSet.getString("ip")] = (
+                    resultSet.getString("domain"), resultSet.getLong("resolved"))
+        finally:
+            stmt.close()
+
+        self._conn.setAutoCommit(False)
+        self._insert = self._conn.prepareStatement(
+            'INSERT OR REPLACE INTO reverse_dns (ip, domain, resolved) VALUES (?, ?, ?);')
+
+    def get(self, ip):
+        with self._lock:
+            entry = self._domains.get(ip)
+        if entry is None:
+            return None
+        domain, resolved = entry
+        if (domain == logextractor.reverse_dns.DNS_NOT_FOUND and
+                time.time() - resolved > logextractor.reverse_dns.DNS_NEGATIVE_TTL):
+            return None
+        return domain
+
+    def put(self, ip, domain):
+        # Called by the resolver workers
+        resolved = int(time.time())
+        with self._lock:
+            self._domains[ip] = (domain, resolved)
+            self._insert.setString(1, ip)
+            self._insert.setString(2, domain)
+            self._insert.setLong(3, resolved)
+            self._insert.addBatch()
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write()
+
+    def _write(self):
+        # Called with the lock held
+        self._pending = 0
+        self._insert.executeBatch()
+        self._conn.commit()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._insert.close()
+            self._conn.close()
+
+
+class ContentFile(object):
+    """Read-only, seekable file-like object over the content of an Autopsy file
+        Reads go through a ReadContentInputStream with a buffer, so the
+        extractors read the evidence directly instead of a copy in the temp folder
+        content: The file to read (AbstractFile)
+        buffer_size: Bytes read from the stream at a time (int)
+    """
+
+    def __init__(self, content, buffer_size=CONTENT_BUFFER_SIZE):
+        self.content = content
+        self.name = content.getName()
+        self.size = content.getSize()
+        self.buffer_size = buffer_size
+        self.closed = False
+        self._stream = ReadContentInputStream(content)
+        self._java_buffer = jarray.zeros(buffer_size, 'b')
+        self._buffer = ''
+        self._buffer_start = 0
+        self._position = 0
+
+    def reopen(self):
+        # A new reader over the same content, used by parallel scans
+        return ContentFile(self.content, self.buffer_size)
+
+    def content_hash(self):
+        # MD5 of the content from the hash lookup module, None if it did not run
+        # (hashing it here would read the file once more before it is parsed)
+        md5 = self.content.getMd5Hash()
+        if md5:
+            return md5.lower()
+        return None
+
+    def _fill(self):
+        # Makes sure the buffer holds the byte at the current position
+        buffer_end = self._buffer_start + len(self._buffer)
+        if self._buffer_start <= self._position < buffer_end:
+            return
+        try:
+            self._stream.seek(self._position)
+            count = self._stream.read(self._java_buffer, 0, self.buffer_size)
+        except JavaIOException as e:
+            raise IOError('Could not read ' + self.name + ': ' + str(e.getMessage()))
+        self._buffer_start = self._position
+        if count > 0:
+            # One byte per character, the same as reading a file with open()
+            self._buffer = PyString(StringUtil.fromBytes(self._java_buffer, 0, count))
+        else:
+            self._buffer = ''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        parts = []
+        while size > 0 and self._position < self.size:
+            self._fill()
+            offset = self._position - self._buffer_start
+            data = self._buffer[offset:offset + size]
+            if not data:
+                break
+            parts.append(data)
+            self._position += len(data)
+            size -= len(data)
+        return ''.join(parts)
+
+    def readline(self):
+        parts = []
+        while self._position < self.size:
+            self._fill()
+            offset = self._position - self._buffer_start
+            line_end = self._buffer.find('\n', offset)
+            if line_end == -1:
+                data = self._buffer[offset:]
+            else:
+                data = self._buffer[offset:line_end + 1]
+            if not data:
+                break
+            parts.append(data)
+            self._position += len(data)
+            if line_end != -1:
+                break
+        return ''.join(parts)
+
+    def readlines(self):
+        return list(self)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._position = max(0, offset)
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1 +1,4 @@
-from logextractor import log_extractor
\ No newline at end of file
+from logextractor import log_extractor
+from logextractor import compressed_logs
+from logextractor import log_timestamps
+from logextractor import reverse_dns
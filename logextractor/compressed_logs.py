@@ -0,0 +1,234 @@
+import re
+import gzip
+import zlib
+import struct
+import zipfile
+
+# Plain, rotated (.log.1) and compressed (.log.gz, .log.1.gz, .log.zip) logs
+# and the CBS persist archives (CbsPersist_20180101000000.cab)
+LOG_FILE_NAME_PATTERN = re.compile(
+    r'(\.log(\.\d+)?(\.gz|\.zip)?|^cbspersist_\d+\.cab)$', re.IGNORECASE)
+# Names of the logs kept inside .zip and .cab archives
+ARCHIVED_LOG_NAME_PATTERN = re.compile(r'\.log(\.\d+)?$', re.IGNORECASE)
+
+# Size of the reads done on the decompressed streams
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# CAB header flags and compression types
+CAB_SIGNATURE = 'MSCF'
+CAB_FLAG_PREV_CABINET = 0x0001
+CAB_FLAG_NEXT_CABINET = 0x0002
+CAB_FLAG_RESERVE_PRESENT = 0x0004
+CAB_COMPRESSION_NONE = 0
+CAB_COMPRESSION_MSZIP = 1
+# MSZIP blocks can refer to the last 32 KB of the previous block
+MSZIP_HISTORY_SIZE = 32 * 1024
+
+
+def is_log_file_name(file_name):
+    return LOG_FILE_NAME_PATTERN.search(file_name) is not None
+
+
+def is_compressed_log_name(file_name):
+    file_name = file_name.lower()
+    return (file_name.endswith('.gz') or file_name.endswith('.zip') or
+            file_name.endswith('.cab')) and is_log_file_name(file_name)
+
+
+def iter_log_streams(source, file_name):
+    # Yields a stream with the decompressed content of each log in the file,
+    # nothing is extracted to disk
+    # The source is a seekable file-like object opened in binary mode
+    # Each stream must be read before asking for the next one
+    file_name = file_name.lower()
+    source.seek(0)
+    if file_name.endswith('.gz'):
+        yield gzip.GzipFile(fileobj=source, mode='rb')
+    elif file_name.endswith('.zip'):
+        archive = zipfile.ZipFile(source)
+        try:
+            for member in archive.infolist():
+                if ARCHIVED_LOG_NAME_PATTERN.search(member.filename):
+                    stream = archive.open(member)
+                    try:
+                        yield stream
+                    finally:
+                        stream.close()
+        finally:
+            archive.close()
+    elif file_name.endswith('.cab'):
+        for name, stream in iter_cab_members(source):
+            if ARCHIVED_LOG_NAME_PATTERN.search(name):
+                yield stream
+    else:
+        yield source
+
+
+class CabFile(object):
+    """CAB file member as listed by its CFFILE entry
+        name: File name inside the cabinet (string)
+        size: Uncompressed size (int)
+        folder: Index of the folder with the data (int)
+        offset: Offset of the data in the uncompressed folder (int)
+    """
+
+    def __init__(self, name, size, folder, offset):
+        self.name = name
+        self.size = size
+        self.folder = folder
+        self.offset = offset
+
+
+def iter_cab_members(source):
+    # Yields (name, stream) for every file of a single cabinet, in the order
+    # their data is stored, decompressing the folders while they are read
+    # Only uncompressed and MSZIP folders are supported (CBS uses MSZIP)
+    source.seek(0)
+    header = source.read(36)
+    if len(header) < 36 or header[:4] != CAB_SIGNATURE:
+        raise IOError('Not a CAB file')
+    (coff_files, num_folders, num_files, flags) = (
+        struct.unpack('<I', header[16:20])[0],
+        struct.unpack('<H', header[26:28])[0],
+        struct.unpack('<H', header[28:30])[0],
+        struct.unpack('<H', header[30:32])[0])
+
+    folder_reserve = 0
+    data_reserve = 0
+    if flags & CAB_FLAG_RESERVE_PRESENT:
+        header_reserve, folder_reserve, data_reserve = struct.unpack(
+            '<HBB', source.read(4))
+        source.read(header_reserve)
+    if flags & CAB_FLAG_PREV_CABINET:
+        _read_cab_string(source)
+        _read_cab_string(source)
+    if flags & CAB_FLAG_NEXT_CABINET:
+        _read_cab_string(source)
+        _read_cab_string(source)
+
+    folders = []
+    for i in xrange(num_folders):
+        data_offset, num_blocks, compression = struct.unpack(
+            '<IHH', source.read(8))
+        source.read(folder_reserve)
+        folders.append((data_offset, num_blocks, compression & 0x000F))
+
+    source.seek(coff_files)
+    files = []
+    for i in xrange(num_files):
+        size, offset, folder = struct.unpack('<IIH', source.read(10))
+        source.read(6)
+        files.append(CabFile(_read_cab_string(source), size, folder, offset))
+
+    for folder_index, (data_offset, num_blocks, compression) in enumerate(folders):
+        folder_files = sorted([f for f in files if f.folder == folder_index],
+                              key=lambda f: f.offset)
+        if not folder_files:
+            continue
+        if compression not in (CAB_COMPRESSION_NONE, CAB_COMPRESSION_MSZIP):
+            raise IOError('CAB compression type ' + str(compression) + ' is not supported')
+        folder = _CabFolderReader(source, data_offset, num_blocks,
+                                  compression, data_reserve)
+        for cab_file in folder_files:
+            yield cab_file.name, _CabMemberStream(folder, cab_file)
+
+
+def _read_cab_string(source):
+    chars = []
+    while True:
+        char = source.read(1)
+        if not char or char == '\0':
+            return ''.join(chars)
+        chars.append(char)
+
+
+class _CabFolderReader(object):
+    # Sequential reader of the uncompressed data of a CAB folder
+    # The data blocks are read from the source and decompressed one at a time
+
+    def __init__(self, source, data_offset, num_blocks, compression, data_reserve):
+        self.source = source
+        self.compression = compression
+        self.data_reserve = data_reserve
+        self.blocks_left = num_blocks
+        self.next_block_offset = data_offset
+        self.history = ''
+        self.block = ''
+        self.block_position = 0
+        # Offset in the uncompressed folder of the next byte returned by read
+        self.position = 0
+
+    def _next_block(self):
+        if self.blocks_left <= 0:
+            return False
+        self.blocks_left -= 1
+        self.source.seek(self.next_block_offset)
+        checksum, compressed_size, uncompressed_size = struct.unpack(
+            '<IHH', self.source.read(8))
+        self.source.read(self.data_reserve)
+        data = self.source.read(compressed_size)
+        self.next_block_offset = self.source.tell()
+
+        if self.compression == CAB_COMPRESSION_MSZIP:
+            if data[:2] != 'CK':
+                raise IOError('Invalid MSZIP block')
+            self.block = _inflate_mszip_block(data[2:], self.history)
+            self.history = (self.history + self.block)[-MSZIP_HISTORY_SIZE:]
+        else:
+            self.block = data
+        self.block_position = 0
+        return True
+
+    def read(self, size):
+        parts = []
+        while size > 0:
+            if self.block_position >= len(self.block) and not self._next_block():
+                break
+            data = self.block[self.block_position:self.block_position + size]
+            self.block_position += len(data)
+            self.position += len(data)
+            size -= len(data)
+            parts.append(data)
+        return ''.join(parts)
+
+
+def _inflate_mszip_block(data, history):
+    # Every MSZIP block is a raw deflate stream that can refer to the data of
+    # the previous block. zlib has no preset dictionary for raw streams here,
+    # so the history is sent first as a stored (uncompressed) deflate block
+    # and removed from the output
+    prefix = ''
+    if history:
+        prefix = '\0' + struct.pack('<HH', len(history), len(history) ^ 0xFFFF) + history
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    inflated = decompressor.decompress(prefix + data) + decompressor.flush()
+    return inflated[len(history):]
+
+
+class _CabMemberStream(object):
+    # Read-only stream over one file of a CAB folder
+    # Files of a folder must be read in the order of their data
+
+    def __init__(self, folder, cab_file):
+        self.folder = folder
+        self.name = cab_file.name
+        self.start = cab_file.offset
+        self.end = cab_file.offset + cab_file.size
+
+    def read(self, size=-1):
+        if self.folder.position < self.start:
+            # Skip the data of the files before this one
+            while self.folder.position < self.start:
+                if not self.folder.read(min(STREAM_BUFFER_SIZE,
+                                            self.start - self.folder.position)):
+                    return ''
+        elif self.folder.position > self.end:
+            raise IOError('CAB file ' + self.name + ' was read out of order')
+
+        left = self.end - self.folder.position
+        if size is None or size < 0 or size > left:
+            size = left
+        return self.folder.read(size)
+
+    def close(self):
+        pass
@@ -3,93 +3,1348 @@ import sys
 import codecs
 import socket
 import re
-from java.lang import Exception as JavaException
+import sre_parse
+import sre_constants
+import time
+import threading
+import heapq
+import netaddr
+from netaddr.ip.bulk import IP_CLASSES, IP_CLASS_TABLES, parse_ips
+from netaddr.eui.ieee import OUI_TABLE, IAB_TABLE
+from collections import OrderedDict
+from itertools import chain, islice
+from logextractor.log_timestamps import (TimeBuckets, DETECT_LINES, DETECT_SIZE,
+                                         detect_timestamp_format, get_timestamp_format)
+
+try:
+    from java.lang import Exception as JavaException
+except ImportError:
+    # Under CPython no Java exception can be raised by the scan
+    class JavaException(Exception):
+        pass
+
+try:
+    import mmap
+except ImportError:
+    # Jython has no mmap module, Java NIO maps the file instead
+    mmap = None
+    from java.io import RandomAccessFile
+    from java.nio.channels import FileChannel
+    from org.python.core import PyString
+    from org.python.core.util import StringUtil
+
+try:
+    # Ranges of a big file are scanned by Java executor threads under Jython
+    from java.lang import Runtime
+    from java.util.concurrent import Callable, Executors
+except ImportError:
+    # And by a process pool under CPython
+    Callable = None
+    import multiprocessing
 
 # Only for IPv4
 IP_REGEX_PATTERN = r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b"
 # For IPv6
 IPV6_REGEX_PATTERN = r"(?:(?:[0-9A-Fa-f]{1,4}:){6}(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|::(?:[0-9A-Fa-f]{1,4}:){5}(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:[0-9A-Fa-f]{1,4})?::(?:[0-9A-Fa-f]{1,4}:){4}(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4})?::(?:[0-9A-Fa-f]{1,4}:){3}(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:(?:[0-9A-Fa-f]{1,4}:){,2}[0-9A-Fa-f]{1,4})?::(?:[0-9A-Fa-f]{1,4}:){2}(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:(?:[0-9A-Fa-f]{1,4}:){,3}[0-9A-Fa-f]{1,4})?::[0-9A-Fa-f]{1,4}:(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:(?:[0-9A-Fa-f]{1,4}:){,4}[0-9A-Fa-f]{1,4})?::(?:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}|(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\\.){3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5]))|(?:(?:[0-9A-Fa-f]{1,4}:){,5}[0-9A-Fa-f]{1,4})?::[0-9A-Fa-f]{1,4}|(?:(?:[0-9A-Fa-f]{1,4}:){,6}[0-9A-Fa-f]{1,4})?::)"
 
+# MAC addresses: 00:11:22:33:44:55, 00-11-22-33-44-55 or 0011.2233.4455
+# Not part of a longer run of hex digits, or of an IPv6 address
+MAC_REGEX_PATTERN = (r"(?<![0-9A-Fa-f])(?<![0-9A-Fa-f][:.-])(?<!::)"
+                     r"(?:[0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5}"
+                     r"|[0-9A-Fa-f]{2}(?:-[0-9A-Fa-f]{2}){5}"
+                     r"|[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4})"
+                     r"(?![0-9A-Fa-f]|[:.-][0-9A-Fa-f])")
+# Part of every form of MAC_REGEX_PATTERN, hex pairs around the separators
+MAC_HINT_PATTERN = (r"[0-9A-Fa-f]{2}[:-][0-9A-Fa-f]{2}[:-][0-9A-Fa-f]{2}[:-][0-9A-Fa-f]{2}"
+                    r"|[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}\.")
+MAC_HINT = re.compile(MAC_HINT_PATTERN)
+# MAC address as 001122AABBCC in the MAC Address field of a DHCP server audit log
+# line (ID,Date,Time,Description,IP Address,Host Name,MAC Address,...)
+# Only with a hex letter, any other 12 digit field (eg: a time) is not taken
+DHCP_AUDIT_MAC_PATTERN = (r"\d+,\d\d/\d\d/\d\d,\d\d:\d\d:\d\d,[^,\r\n]*,[^,\r\n]*,[^,\r\n]*,"
+                          r"((?=[0-9]*[A-Fa-f])[0-9A-Fa-f]{12}),")
+# Addresses that are not of a device
+MAC_IGNORED = (0, 0xFFFFFFFFFFFF)
+# Vendors given when the address has no registered one
+MAC_LOCALLY_ADMINISTERED = 'Locally administered'
+MAC_NOT_REGISTERED = 'Not registered'
+
+# Size of the buffer used to stream log files
+READ_BUFFER_SIZE = 64 * 1024
+# Lines longer than this are scanned in pieces of this size, so memory stays
+# bounded on binary or minified files (a match across two pieces is missed)
+MAX_LINE_LENGTH = 1024 * 1024
+
+# Files from this size on are memory mapped and scanned in chunks
+MAPPED_SCAN_THRESHOLD = 64 * 1024 * 1024
+# Size of each mapped chunk
+MAPPED_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Files from this size on are split in line aligned ranges scanned in parallel
+PARALLEL_SCAN_THRESHOLD = 512 * 1024 * 1024
+# Smallest range given to a worker
+PARALLEL_MIN_RANGE_SIZE = 128 * 1024 * 1024
+
+# Maximum number of addresses kept in the IP information cache
+IP_CACHE_SIZE = 65536
+
+# Seconds each custom RegEx can take on one file before it is stopped there
+REGEX_TIME_BUDGET = 60.0
+# Files a custom RegEx can run out of time on before it is no longer used in the job
+REGEX_MAX_OVERRUNS = 3
+# Why a custom RegEx did not go through the whole file
+REGEX_OUT_OF_TIME = 'Out of time'
+REGEX_DEGRADED = 'Degraded'
+# Bytes of lines handed to the RegEx worker at a time
+REGEX_BATCH_SIZE = 1024 * 1024
+# Seconds between checks on the RegEx worker
+REGEX_POLL_INTERVAL = 0.1
+
+# Bytes of the sample log read to benchmark a custom RegEx
+BENCHMARK_SIZE = 16 * 1024 * 1024
+# Seconds a custom RegEx can take in the benchmark
+BENCHMARK_TIME_BUDGET = 10.0
+# Lines slower than this (seconds) point to catastrophic backtracking
+BENCHMARK_SLOW_LINE = 0.01
+# Share of matched lines from which a RegEx is too broad
+BENCHMARK_BROAD_RATE = 0.5
+
+# Sample lines kept for each IP + Protocol combination
+IP_SAMPLE_SIZE = 5
+# Sample lines longer than this are cut
+SAMPLE_LINE_MAX_LENGTH = 512
+
 # Protocols
-PROTOCOLS = ["TCP",  "UDP", "ICMP", "HTTP", "IMAP"
+PROTOCOLS = ["TCP", "UDP", "ICMP", "HTTP", "IMAP",
              "FTP", "POP3", "SSH", "TLS", "SSL"]
 
 
-def extract_ip_addresses(path_to_file):
-    list_ips = []
+class LogScanner(object):
+    """Single pass scan engine for ad hoc logs
+        Every line is read once and goes through the IP patterns and all the
+        custom RegExes, instead of re-reading the file for each one of them
+        custom_regexes: RegExes inserted by the user (list of strings)
+        check_ips: If IPv4 and IPv6 addresses are extracted (boolean)
+        protocols: Protocols looked up in the lines with IPs (list of strings)
+        sample_size: Sample lines kept for each IP + Protocol combination (int)
+        timestamp_format: Format of the times in the log, they are only looked
+            up if one is given (TimestampFormat)
+        time_budget: Seconds each custom RegEx can take, None for no limit (float)
+        check_macs: If MAC addresses are extracted (boolean)
+    """
+
+    def __init__(self, custom_regexes=(), check_ips=True, protocols=PROTOCOLS,
+                 sample_size=IP_SAMPLE_SIZE, timestamp_format=None, time_budget=None,
+                 check_macs=False):
+        self.check_ips = check_ips
+        self.check_macs = check_macs
+        self.sample_size = sample_size
+        self.time_budget = time_budget
+        self.protocol_tagger = ProtocolTagger(protocols)
+        self.p_ipv4 = re.compile(IP_REGEX_PATTERN)
+        self.p_ipv6 = re.compile(IPV6_REGEX_PATTERN)
+        self.p_mac = re.compile(MAC_REGEX_PATTERN)
+        self.p_dhcp_mac = re.compile(DHCP_AUDIT_MAC_PATTERN)
+        self.custom_patterns = []
+        self.regex_results = {}
+        for regex in custom_regexes:
+            if regex not in self.regex_results:
+                self.custom_patterns.append((regex, re.compile(regex)))
+                self.regex_results[regex] = {}
+
+        # Literals that must be in a line for each custom RegEx to match in it
+        # The lines with none of them are found with a single search
+        self.regex_literals = dict((regex, required_literals(regex))
+                                   for regex in self.regex_results)
+        self._update_literal_gate()
+
+        # Time taken by each custom RegEx, and the ones stopped before the end
+        # eg: {"(a+)+b": "Out of time"}
+        self.regex_elapsed = dict((regex, 0.0) for regex in self.regex_results)
+        self.incomplete = {}
+        # Worker that runs the custom RegExes when they have a time budget,
+        # and the lines waiting for it (line, offset, time carried, regexes)
+        self._runner = None
+        self._pending = []
+        self._pending_size = 0
+
+        # Occurrences of each IP + Protocol combination, keyed by (ip, protocol)
+        # The keys are also kept in the order they were first seen
+        self.ip_occurrences = {}
+        self.ip_keys = []
+
+        # Occurrences of each MAC address, keyed by its value (int)
+        # The keys are also kept in the order they were first seen
+        self.mac_occurrences = {}
+        self.mac_keys = []
+
+        # Byte offset in the file of the next line to be scanned
+        self.position = 0
+
+        # When each IP + Protocol combination and each match showed up
+        # eg: {(ip, protocol): TimeBuckets}, {regex: {match: TimeBuckets}}
+        self.ip_times = {}
+        self.mac_times = {}
+        self.regex_times = dict((regex, {}) for regex in self.regex_results)
+        self.set_timestamp_format(timestamp_format)
+
+        # Prefilter statistics, lines that could not hold an address skip the regex
+        # And lines without the literals of a custom RegEx skip that RegEx
+        self.stats = {'lines': 0, 'ipv4_skipped': 0, 'ipv6_skipped': 0, 'ip_skipped': 0,
+                      'regex_skipped': 0}
+        if check_macs:
+            self.stats['mac_skipped'] = 0
+
+    def _update_literal_gate(self):
+        # One alternation with the literals of all the custom RegExes in use
+        # literals_required is True if every one of them has literals
+        literals = set()
+        self.literals_required = bool(self.custom_patterns)
+        for regex, _ in self.custom_patterns:
+            if self.regex_literals[regex] is None:
+                self.literals_required = False
+            else:
+                literals.update(self.regex_literals[regex])
+        self.literal_gate = None
+        if literals:
+            self.literal_gate = re.compile('|'.join(
+                re.escape(literal) for literal in sorted(literals, key=len, reverse=True)))
+
+    def set_timestamp_format(self, timestamp_format):
+        # Each file (or stream) can have its own format
+        self.timestamp_format = timestamp_format
+        self.carry_forward = timestamp_format is not None and timestamp_format.carry_forward
+        # Time of the last line with a timestamp, for the formats that carry it forward
+        self.current_time = None
+        # Time of the last line parsed, by its offset
+        self._time_offset = None
+        self._time = None
+
+    def scan_lines(self, lines):
+        for line in lines:
+            self.scan_line(line)
+        self.flush()
+
+    def scan_line(self, line):
+        # The line is raw, as read in binary mode (line ending included)
+        offset = self.position
+        self.position += len(line)
+        self.stats['lines'] += 1
+        if self.carry_forward:
+            self._carry_time(line, 0, len(line))
+        if self.check_ips:
+            try:
+                self._scan_ips(line, 0, len(line), offset)
+            except JavaException as e:
+                raise StandardError(u'Log Extractor Exception: ' + e.getMessage())
+        if self.check_macs:
+            self._scan_macs(line, 0, len(line), offset)
+
+        if self.custom_patterns:
+            has_literals = self._has_literals(line, 0, len(line))
+            if has_literals or not self.literals_required:
+                # Same line ending as a file opened in text mode on Windows
+                if line.endswith('\r\n'):
+                    line = line[:-2] + '\n'
+                self._scan_custom(line, offset, has_literals)
+            else:
+                self.stats['regex_skipped'] += len(self.custom_patterns)
+
+    def scan_text(self, text):
+        # Scans a block of whole lines without building a string for each line
+        # The IP patterns and prefilters run over the range of each line in the
+        # block, lines are only sliced for the custom RegExes
+        # Gives the same results as scan_line on each of the lines
+        # Lines longer than MAX_LINE_LENGTH are scanned in pieces of that size,
+        # as they come from _iter_file_lines
+        text_end = len(text)
+        start = 0
+        while start < text_end:
+            end = text.find('\n', start)
+            end = text_end if end == -1 else end + 1
+            if end - start > MAX_LINE_LENGTH:
+                end = start + MAX_LINE_LENGTH
+            self.stats['lines'] += 1
+            if self.carry_forward:
+                self._carry_time(text, start, end)
+            if self.check_ips:
+                try:
+                    self._scan_ips(text, start, end, self.position + start)
+                except JavaException as e:
+                    raise StandardError(u'Log Extractor Exception: ' + e.getMessage())
+            if self.check_macs:
+                self._scan_macs(text, start, end, self.position + start)
+
+            if self.custom_patterns:
+                has_literals = self._has_literals(text, start, end)
+                if has_literals or not self.literals_required:
+                    line = text[start:end]
+                    # Same line ending as a file opened in text mode on Windows
+                    if line.endswith('\r\n'):
+                        line = line[:-2] + '\n'
+                    self._scan_custom(line, self.position + start, has_literals)
+                else:
+                    self.stats['regex_skipped'] += len(self.custom_patterns)
+            start = end
+        self.position += text_end
+        self.flush()
+
+    def _carry_time(self, text, start, end):
+        line_time = self.timestamp_format.parse(text, start, end)
+        if line_time is not None:
+            self.current_time = line_time
+
+    def _line_time(self, text, start, end, offset):
+        # Time of the line that starts at the given offset, parsed only once
+        if self.carry_forward:
+            return self.current_time
+        if offset != self._time_offset:
+            self._time_offset = offset
+            self._time = self.timestamp_format.parse(text, start, end)
+        return self._time
+
+    def _has_literals(self, text, start, end):
+        # If text[start:end] has any of the literals of the custom RegExes
+        return self.literal_gate is not None and self.literal_gate.search(text, start, end) is not None
+
+    def _scan_custom(self, line, offset, has_literals):
+        regexes = []
+        for regex, pattern in self.custom_patterns:
+            literals = self.regex_literals[regex]
+            if literals is not None and not (has_literals and _contains_any(line, literals)):
+                self.stats['regex_skipped'] += 1
+            elif self.time_budget is None:
+                self._add_matches(regex, pattern.findall(line), line, offset, self.current_time)
+            else:
+                regexes.append(regex)
+
+        if regexes:
+            # With a time budget the lines are run in batches on the worker,
+            # which is given up on when a RegEx runs out of time in a line
+            # The time carried forward is kept, it moves on before the batch runs
+            self._pending.append((line, offset, self.current_time, regexes))
+            self._pending_size += len(line)
+            if self._pending_size >= REGEX_BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        # Runs the custom RegExes on the lines waiting for the worker
+        # Done at the end of scan_lines and scan_text, scan_line callers have
+        # to call it before reading the results
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_size = 0
+        if self._runner is None:
+            self._runner = RegexRunner()
+        regexes = [regex for regex, _ in self.custom_patterns]
+        positions = dict((regex, index) for index, regex in enumerate(regexes))
+        results, elapsed, stopped = self._runner.run(
+            [(line, [positions[regex] for regex in line_regexes if regex in positions])
+             for line, _, _, line_regexes in pending],
+            [pattern.findall for _, pattern in self.custom_patterns],
+            [self.time_budget - self.regex_elapsed[regex] for regex in regexes])
+
+        for (line, offset, carried_time, _), line_results in zip(pending, results):
+            for index in sorted(line_results):
+                self._add_matches(regexes[index], line_results[index], line, offset, carried_time)
+        for index, regex in enumerate(regexes):
+            self.regex_elapsed[regex] += elapsed[index]
+        for index in stopped:
+            # A RegEx over its budget is not used in the rest of the file
+            self._stop_regex(regexes[index])
+
+    def _add_matches(self, regex, matches, line, offset, carried_time):
+        regex_dict = self.regex_results[regex]
+        for match in matches:
+            match = match.lower()
+            if regex_dict.get(match):
+                regex_dict[match] += 1
+            else:
+                regex_dict[match] = 1
+
+            if self.timestamp_format is not None:
+                if self.carry_forward:
+                    line_time = carried_time
+                else:
+                    line_time = self._line_time(line, 0, len(line), offset)
+                if line_time is not None:
+                    _add_time(self.regex_times[regex], match, line_time)
+
+    def _stop_regex(self, regex):
+        self.incomplete[regex] = REGEX_OUT_OF_TIME
+        self.custom_patterns = [(r, p) for r, p in self.custom_patterns if r != regex]
+        self._update_literal_gate()
+
+    def close(self):
+        # Stops the RegEx worker, the scanner can still be merged and read
+        if self._runner is not None:
+            self._runner.close()
+            self._runner = None
+
+    def _scan_ips(self, text, start, end, offset):
+        # Looks for IPs in text[start:end], which is one line
+        # The line starts at the given byte offset of the file
+        occurrences = []
+        may_have_ipv4 = may_contain_ipv4(text, start, end)
+        may_have_ipv6 = may_contain_ipv6(text, start, end)
+        if may_have_ipv4:
+            occurrences.extend(self.p_ipv4.findall(text, start, end))
+        else:
+            self.stats['ipv4_skipped'] += 1
+        if may_have_ipv6:
+            occurrences.extend(self.p_ipv6.findall(text, start, end))
+        else:
+            self.stats['ipv6_skipped'] += 1
+        if not (may_have_ipv4 or may_have_ipv6):
+            self.stats['ip_skipped'] += 1
+            return
+
+        protocol = None
+        line_time = None
+        for ip_info in get_ip_infos(occurrences):
+            if ip_info.valid:
+                ip = ip_info.canonical
+
+                # Protocols are looked up once per line and shared by all its IPs
+                if protocol is None:
+                    protocol = self.protocol_tagger.tag(text, start, end)
+                    if self.timestamp_format is not None:
+                        line_time = self._line_time(text, start, end, offset)
+
+                # Add the occurrence to the IP + Protocol combination or create one
+                key = (ip, protocol)
+                occurrences = self.ip_occurrences.get(key)
+                if occurrences is None:
+                    occurrences = IPOccurrences(self.sample_size)
+                    self.ip_occurrences[key] = occurrences
+                    self.ip_keys.append(key)
+                occurrences.add(offset, text, start, end)
+                if line_time is not None:
+                    _add_time(self.ip_times, key, line_time)
+
+    def _scan_macs(self, text, start, end, offset):
+        # Looks for MAC addresses in text[start:end], which is one line
+        if not may_contain_mac(text, start, end):
+            self.stats['mac_skipped'] += 1
+            return
+
+        line_time = None
+        matches = self.p_mac.findall(text, start, end)
+        dhcp_match = self.p_dhcp_mac.match(text, start, end)
+        if dhcp_match is not None:
+            matches.append(dhcp_match.group(1))
+        for match in matches:
+            mac = int(match.replace(':', '').replace('-', '').replace('.', ''), 16)
+            if mac in MAC_IGNORED:
+                continue
+            occurrences = self.mac_occurrences.get(mac)
+            if occurrences is None:
+                occurrences = IPOccurrences(self.sample_size)
+                self.mac_occurrences[mac] = occurrences
+                self.mac_keys.append(mac)
+            occurrences.add(offset, text, start, end)
+            if self.timestamp_format is not None:
+                if line_time is None:
+                    line_time = self._line_time(text, start, end, offset)
+                if line_time is not None:
+                    _add_time(self.mac_times, mac, line_time)
+
+    def merge(self, other):
+        # Adds the results of a scanner that ran over the part of the file
+        # right after the one this scanner went through
+        for key in other.ip_keys:
+            occurrences = self.ip_occurrences.get(key)
+            if occurrences is not None:
+                occurrences.merge(other.ip_occurrences[key])
+            else:
+                self.ip_occurrences[key] = other.ip_occurrences[key]
+                self.ip_keys.append(key)
+        for key in other.mac_keys:
+            occurrences = self.mac_occurrences.get(key)
+            if occurrences is not None:
+                occurrences.merge(other.mac_occurrences[key])
+            else:
+                self.mac_occurrences[key] = other.mac_occurrences[key]
+                self.mac_keys.append(key)
+        self.position = max(self.position, other.position)
+
+        for regex, other_dict in other.regex_results.iteritems():
+            regex_dict = self.regex_results[regex]
+            for match, counter in other_dict.iteritems():
+                regex_dict[match] = regex_dict.get(match, 0) + counter
+
+        _merge_times(self.ip_times, other.ip_times)
+        _merge_times(self.mac_times, other.mac_times)
+        for regex, other_times in other.regex_times.iteritems():
+            _merge_times(self.regex_times[regex], other_times)
+
+        for regex, elapsed in other.regex_elapsed.iteritems():
+            self.regex_elapsed[regex] += elapsed
+        self.incomplete.update(other.incomplete)
+
+        _add_stats(self.stats, other.stats)
+
+    def iter_ips(self, sort=False, details=False):
+        # Yields [ip, protocol, number of occurrences] entries one at a time
+        # In the order they were first seen, or sorted by IP and protocol
+        # With details, the byte offsets of the first and last lines with the
+        # IP and the sample lines are added:
+        # [ip, protocol, number of occurrences, first offset, last offset, [(offset, line)]]
+        keys = sorted(self.ip_keys) if sort else self.ip_keys
+        for key in keys:
+            occurrences = self.ip_occurrences[key]
+            if details:
+                yield [key[0], key[1], occurrences.count, occurrences.first_offset,
+                       occurrences.last_offset, occurrences.sample_lines()]
+            else:
+                yield [key[0], key[1], occurrences.count]
+
+    def list_ips(self, sort=False, details=False):
+        # The format is a bi-dimentional array
+        # eg: [[192.168.1.1, "HTTP",2],[192.168.1.10, "POP",3]]
+        # format is [[ip,protocol,number of occurrences ]]
+        return list(self.iter_ips(sort, details))
+
+    def iter_macs(self, sort=False):
+        # Yields [mac, vendor, number of occurrences, first offset, last offset,
+        # [(offset, line)]] entries one at a time, like iter_ips with details
+        # eg: ["00-0C-29-AB-CD-EF", "VMware, Inc.", 3, 0, 2048, [(0, line)]]
+        keys = sorted(self.mac_keys) if sort else self.mac_keys
+        for key in keys:
+            occurrences = self.mac_occurrences[key]
+            yield [mac_to_str(key), get_mac_vendor(key), occurrences.count,
+                   occurrences.first_offset, occurrences.last_offset,
+                   occurrences.sample_lines()]
+
+    def list_macs(self, sort=False):
+        return list(self.iter_macs(sort))
+
+
+class IPOccurrences(object):
+    """Class for where an IP + Protocol combination (or a MAC address) shows up in a log
+        Memory stays the same no matter how many times the IP is repeated
+        count: Number of occurrences (int)
+        first_offset: Byte offset of the first line with the IP (int)
+        last_offset: Byte offset of the last line with the IP (int)
+        sample_size: Maximum number of sample lines kept (int)
+    """
+
+    def __init__(self, sample_size=IP_SAMPLE_SIZE):
+        self.count = 0
+        self.first_offset = None
+        self.last_offset = None
+        self.sample_size = sample_size
+        # Heap of (-priority, offset, line), the highest priority on top
+        self.samples = []
+
+    def add(self, offset, text, start, end):
+        self.count += 1
+        if offset == self.last_offset:
+            # Another occurrence in the same line
+            return
+        if self.first_offset is None:
+            self.first_offset = offset
+        self.last_offset = offset
+
+        # The lines with the lowest priorities are kept, which is a uniform
+        # sample, and the same one whatever the order the file is scanned in
+        if not self.sample_size:
+            return
+        priority = _sample_priority(offset)
+        if len(self.samples) < self.sample_size:
+            heapq.heappush(self.samples, (-priority, offset, _sample_line(text, start, end)))
+        elif -priority > self.samples[0][0]:
+            heapq.heapreplace(self.samples, (-priority, offset, _sample_line(text, start, end)))
+
+    def merge(self, other):
+        # Adds the occurrences found in the part of the file after this one
+        self.count += other.count
+        if self.first_offset is None:
+            self.first_offset = other.first_offset
+        if other.last_offset is not None:
+            self.last_offset = other.last_offset
+        self.samples = heapq.nlargest(self.sample_size, self.samples + other.samples)
+        heapq.heapify(self.samples)
+
+    def sample_lines(self):
+        # [(offset, line)] in file order
+        return sorted((offset, line) for _, offset, line in self.samples)
+
+
+def _add_time(times, key, timestamp):
+    buckets = times.get(key)
+    if buckets is None:
+        buckets = TimeBuckets()
+        times[key] = buckets
+    buckets.add(timestamp)
+
+
+def _merge_times(times, other_times):
+    for key, other_buckets in other_times.iteritems():
+        buckets = times.get(key)
+        if buckets is None:
+            times[key] = other_buckets
+        else:
+            buckets.merge(other_buckets)
+
+
+def _sample_priority(offset):
+    # Pseudo random, but always the same for a given line
+    # (finalizer of MurmurHash3, offsets of nearby lines end up far apart)
+    h = (offset ^ (offset >> 32)) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & 0xFFFFFFFF
+    return h ^ (h >> 16)
+
+
+def _sample_line(text, start, end):
+    line = text[start:min(end, start + SAMPLE_LINE_MAX_LENGTH)]
+    return line.rstrip('\r\n')
+
+
+class RegexGuard(object):
+    """Class for the time budget of the custom RegExes over an ingest job
+        A RegEx that takes longer than time_budget on a file is stopped there,
+        after max_overruns files it is degraded and no longer used in the job
+        Shared by all the ingest threads of the job
+        time_budget: Seconds each RegEx can take on one file (float)
+        max_overruns: Files a RegEx can run out of time on (int)
+    """
+
+    def __init__(self, time_budget=REGEX_TIME_BUDGET, max_overruns=REGEX_MAX_OVERRUNS):
+        self.time_budget = time_budget
+        self.max_overruns = max_overruns
+        self.overruns = {}
+        self._lock = threading.Lock()
+
+    def is_degraded(self, regex):
+        with self._lock:
+            return self.overruns.get(regex, 0) >= self.max_overruns
+
+    def add_overrun(self, regex):
+        with self._lock:
+            self.overruns[regex] = self.overruns.get(regex, 0) + 1
+
+    def degraded_regexes(self):
+        with self._lock:
+            return [regex for regex, overruns in self.overruns.iteritems()
+                    if overruns >= self.max_overruns]
+
+
+class _RegexJob(object):
+    # Lines to run the functions on, and what they gave
+    def __init__(self, items, functions, budgets):
+        # (line, indexes of the functions to call on it)
+        self.items = items
+        self.functions = functions
+        self.budgets = budgets
+        self.results = [{} for _ in items]
+        self.elapsed = [0.0] * len(functions)
+        self.stopped = set()
+        self.error = None
+        # Next call, as the item and the position in its indexes
+        self.item = 0
+        self.position = 0
+        # Function being called and when it started, None between calls
+        self.current = None
+        self.started = None
+
+    def next_function(self):
+        # Index of the next function to call, None when the job is done
+        while self.item < len(self.items):
+            indexes = self.items[self.item][1]
+            while self.position < len(indexes):
+                index = indexes[self.position]
+                if index not in self.stopped:
+                    return index
+                self.position += 1
+            self.item += 1
+            self.position = 0
+        return None
+
+    def done(self):
+        return self.error is not None or self.next_function() is None
+
+
+class RegexRunner(object):
+    """Runs the custom RegExes on a worker thread, so a line that backtracks
+        catastrophically can be given up on when the time budget runs out,
+        instead of hanging the ingest thread until the match ends
+        A worker that is given up on can't be stopped, it is left to finish the
+        line on its own and its result is thrown away. A new worker goes on
+        with the rest of the lines
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._job = None
+        self._thread = None
+
+    def run(self, items, functions, budgets):
+        # Calls functions (eg: pattern.findall) on lines, items is a list of
+        # (line, indexes of the functions to call on it)
+        # Each function has a budget (seconds) for all the lines, once it is
+        # used up the function is stopped, in the middle of a line if needed
+        # Returns the results of each line ({index: result}), the seconds taken
+        # by each function and the indexes of the ones stopped
+        job = _RegexJob(items, functions, budgets)
+        with self._lock:
+            self._job = job
+            if self._thread is None:
+                self._start_worker()
+            self._changed.notify_all()
+            while not job.done():
+                now = time.time()
+                if job.started is None:
+                    self._changed.wait(REGEX_POLL_INTERVAL)
+                    continue
+                deadline = job.started + budgets[job.current] - job.elapsed[job.current]
+                if now < deadline:
+                    self._changed.wait(min(deadline - now, REGEX_POLL_INTERVAL))
+                    continue
+                # Out of time in the middle of a line, a new worker goes on
+                # with the next call
+                job.elapsed[job.current] = budgets[job.current]
+                job.stopped.add(job.current)
+                job.position += 1
+                job.current = None
+                job.started = None
+                self._start_worker()
+            self._job = None
+        if job.error is not None:
+            raise job.error
+        return job.results, job.elapsed, job.stopped
+
+    def close(self):
+        # Stops the worker once it is done with its line
+        with self._lock:
+            self._thread = None
+            self._changed.notify_all()
+
+    def _start_worker(self):
+        self._thread = threading.Thread(target=self._work, name='LFA RegEx')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _work(self):
+        thread = threading.current_thread()
+        while True:
+            with self._lock:
+                while self._thread is thread and (self._job is None or self._job.done()):
+                    self._changed.wait()
+                if self._thread is not thread:
+                    return
+                job = self._job
+                index = job.next_function()
+                line = job.items[job.item][0]
+                job.current = index
+                job.started = time.time()
+            try:
+                result = job.functions[index](line)
+            except (Exception, JavaException) as e:
+                result = None
+                error = e
+            else:
+                error = None
+            with self._lock:
+                if self._thread is not thread:
+                    # Given up on, the result is thrown away
+                    return
+                job.error = error
+                job.results[job.item][index] = result
+                job.elapsed[index] += time.time() - job.started
+                if job.elapsed[index] > job.budgets[index]:
+                    job.stopped.add(index)
+                job.position += 1
+                job.current = None
+                job.started = None
+                if job.done():
+                    self._changed.notify_all()
+
+
+class ProtocolTagger(object):
+    """Finds the protocols mentioned in a line with one compiled alternation
+        protocols: Protocol names to look for, matched as whole words (list of strings)
+    """
+
+    def __init__(self, protocols=PROTOCOLS):
+        # Matched words are mapped back to the name in the vocabulary
+        self.names = dict((p.upper(), p) for p in protocols)
+        # Longest names first, so a name is never cut short by its prefix
+        alternation = '|'.join(re.escape(p) for p in
+                               sorted(self.names, key=len, reverse=True))
+        self.pattern = re.compile(r'\b(?:' + alternation + r')\b', re.IGNORECASE)
+
+    def tag(self, text, start=0, end=None):
+        # Tags text[start:end], usually one line
+        # Order protocol list alphabetically and convert to string...
+        # Sorting protocols and not allowing duplicates means that
+        # The protocol attribute will have consistency and will be
+        # Easily filtered in any format
+        # eg: "HTTP TCP " (trailing space kept, as in previous versions)
+        if not self.names:
+            return 'N/A'
+        if end is None:
+            end = len(text)
+        found = set(self.names[p.upper()] for p in self.pattern.findall(text, start, end))
+        if not found:
+            return 'N/A'
+        return u''.join(p + ' ' for p in sorted(found))
+
+
+def _contains_any(line, literals):
+    for literal in literals:
+        if literal in line:
+            return True
+    return False
+
+
+# Required literals of each RegEx already worked out
+_REQUIRED_LITERALS = {}
+
+
+def required_literals(regex):
+    # Returns literals such that every line a RegEx matches in has at least
+    # one of them, or None if there are none (eg: "\d+")
+    # eg: "Failed password for (\w+)" -> ["Failed password for "]
+    #     "(error|warning): \d+" -> ["error", "warning"]
+    # Only the literals that can't be missed are taken, a case insensitive
+    # RegEx has none
+    if regex in _REQUIRED_LITERALS:
+        return _REQUIRED_LITERALS[regex]
     try:
-        lines = _read_file_lines(path_to_file)
-    except IOError:
-        raise
+        parsed = sre_parse.parse(regex)
+    except (sre_constants.error, TypeError, ValueError, OverflowError):
+        literals = None
+    else:
+        if parsed.pattern.flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_LOCALE):
+            literals = None
+        else:
+            literals = _sequence_literals(parsed)
+    _REQUIRED_LITERALS[regex] = literals
+    return literals
+
+
+def _sequence_literals(items):
+    # Best set of literals required by a sequence of RegEx items: the one
+    # whose shortest literal is the longest
+    candidates = []
+    run = []
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            # Line breaks are not in the text the prefilter sees
+            if av < 128 and chr(av) not in '\r\n':
+                run.append(chr(av))
+                continue
+        elif op == sre_constants.AT:
+            # Anchors take no characters, the literal goes on
+            continue
+
+        if run:
+            candidates.append([''.join(run)])
+            run = []
+        if op == sre_constants.SUBPATTERN:
+            candidates.append(_sequence_literals(av[-1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if av[0] >= 1:
+                candidates.append(_sequence_literals(av[2]))
+        elif op == sre_constants.BRANCH:
+            branches = [_sequence_literals(branch) for branch in av[1]]
+            if None not in branches:
+                candidates.append(sorted(set(literal for branch in branches for literal in branch)))
+    if run:
+        candidates.append([''.join(run)])
+
+    candidates = [candidate for candidate in candidates if candidate]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda candidate: min(len(literal) for literal in candidate))
+
+
+class RegexBenchmark(object):
+    """Class for how a custom RegEx does on a sample log
+        regex: The RegEx (string)
+        bytes_read: Bytes of the sample searched (int)
+        elapsed: Seconds taken, the prefilter included (float)
+        lines: Lines searched (int)
+        matched_lines: Lines with at least one match (int)
+        slow_lines: Lines that took longer than BENCHMARK_SLOW_LINE (int)
+        finished: If it went through the whole sample within the budget (boolean)
+        warnings: What could go wrong in an ingest job (list of strings)
+    """
+
+    def __init__(self, regex):
+        self.regex = regex
+        self.bytes_read = 0
+        self.elapsed = 0.0
+        self.lines = 0
+        self.matched_lines = 0
+        self.slow_lines = 0
+        self.finished = True
+        self.warnings = []
+
+    def megabytes_per_second(self):
+        return self.bytes_read / (1024.0 * 1024.0) / max(self.elapsed, 1e-6)
+
+    def match_rate(self):
+        return float(self.matched_lines) / self.lines if self.lines else 0.0
+
+    def __repr__(self):
+        # eg: "user\d: 85.2 MB/s, 3.1% of lines matched"
+        summary = (self.regex + ': ' + str(round(self.megabytes_per_second(), 1)) + ' MB/s, ' +
+                   str(round(self.match_rate() * 100, 1)) + '% of lines matched')
+        if self.warnings:
+            summary += ' (' + '; '.join(self.warnings) + ')'
+        return summary
 
-    p_ipv4 = re.compile(IP_REGEX_PATTERN)
-    p_ipv6 = re.compile(IPV6_REGEX_PATTERN)
 
-    # this is what will be returned, the formart is a bi-dimentional array
-    # eg: [[192.168.1.1, "HTTP",2],[192.168.1.10, "POP",3]]
-    # format is [[ip,protocol,number of occurrences ]]
-    for line in lines:
+def benchmark_regex(regex, source, max_bytes=BENCHMARK_SIZE,
+                    time_budget=BENCHMARK_TIME_BUDGET):
+    # Searches the RegEx in the first max_bytes of a sample log, the same way
+    # as in an ingest job (literal prefilter included), and times it
+    # The source is a path or a seekable file-like object opened in binary mode
+    # The search runs on a RegexRunner, so a line that backtracks
+    # catastrophically is given up on when the budget runs out
+    benchmark = RegexBenchmark(regex)
+    pattern = re.compile(regex)
+    literals = required_literals(regex)
+    benchmark.warnings.extend(backtracking_warnings(regex))
+    if literals is None:
+        benchmark.warnings.append('no required literals, every line is searched')
+
+    def search(line):
+        # Timed on the worker, to find the slow lines
+        started = time.time()
+        found = pattern.search(line) is not None
+        return found, time.time() - started
+
+    runner = RegexRunner()
+    try:
+        # Lines for the runner (line, [0] if it is searched) and their sizes
+        items = []
+        sizes = []
+        batch_size = 0
+        bytes_read = 0
+        for line in _iter_file_lines(source):
+            bytes_read += len(line)
+            sizes.append(len(line))
+            started = time.time()
+            if literals is None or _contains_any(line, literals):
+                if line.endswith('\r\n'):
+                    line = line[:-2] + '\n'
+                items.append((line, [0]))
+                batch_size += len(line)
+            else:
+                items.append(('', []))
+            benchmark.elapsed += time.time() - started
+            if bytes_read >= max_bytes:
+                break
+            if batch_size >= REGEX_BATCH_SIZE:
+                if not _run_benchmark_batch(benchmark, runner, search, items, sizes, time_budget):
+                    break
+                items = []
+                sizes = []
+                batch_size = 0
+        if items and benchmark.finished:
+            _run_benchmark_batch(benchmark, runner, search, items, sizes, time_budget)
+    finally:
+        runner.close()
+
+    if benchmark.slow_lines:
+        benchmark.warnings.append(str(benchmark.slow_lines) + ' lines took over ' +
+                                  str(int(BENCHMARK_SLOW_LINE * 1000)) + ' ms')
+    if not benchmark.finished:
+        benchmark.warnings.append('timed out after ' + str(time_budget) + ' s')
+    if benchmark.match_rate() >= BENCHMARK_BROAD_RATE:
+        benchmark.warnings.append('matches most lines, too broad?')
+    return benchmark
+
+
+def _run_benchmark_batch(benchmark, runner, search, items, sizes, time_budget):
+    # Adds up a batch of lines of the benchmark, returns False if the RegEx
+    # ran out of time in it
+    results, elapsed, stopped = runner.run(items, [search], [time_budget - benchmark.elapsed])
+    for (_, indexes), size, line_results in zip(items, sizes, results):
+        if indexes and 0 not in line_results:
+            # Not searched, the RegEx was stopped before this line
+            break
+        benchmark.lines += 1
+        benchmark.bytes_read += size
+        if indexes:
+            matched, line_elapsed = line_results[0]
+            if matched:
+                benchmark.matched_lines += 1
+            if line_elapsed > BENCHMARK_SLOW_LINE:
+                benchmark.slow_lines += 1
+    benchmark.elapsed += elapsed[0]
+    if stopped:
+        benchmark.finished = False
+    return not stopped
+
+
+def backtracking_warnings(regex):
+    # Spots the shapes that backtrack catastrophically, eg: "(a+)+b", "(\w*\s?)*$"
+    # A repeated group with a variable length repeat inside tries every way of
+    # splitting the text between them before failing
+    try:
+        parsed = sre_parse.parse(regex)
+    except (sre_constants.error, TypeError, ValueError, OverflowError):
+        return []
+    if _has_nested_repeat(parsed, False):
+        return ['nested quantifiers, may backtrack catastrophically']
+    return []
+
+
+def _has_nested_repeat(items, in_repeat):
+    for op, av in items:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            variable = av[1] > av[0]
+            if in_repeat and variable:
+                return True
+            if _has_nested_repeat(av[2], in_repeat or (variable and av[1] > 1)):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _has_nested_repeat(av[-1], in_repeat):
+                return True
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                if _has_nested_repeat(branch, in_repeat):
+                    return True
+    return False
+
+
+def may_contain_ipv4(text, start, end):
+    # An IPv4 address needs three dots
+    return text.count('.', start, end) >= 3
+
+
+def may_contain_ipv6(text, start, end):
+    # Every form matched by IPV6_REGEX_PATTERN has either '::' or six colons
+    return text.find('::', start, end) != -1 or text.count(':', start, end) >= 6
+
+
+def may_contain_mac(text, start, end):
+    # Every form matched by MAC_REGEX_PATTERN has five colons, five hyphens or
+    # two dots, with hex digits next to them (eg: not the dots of an IPv4 address)
+    # A line matched by DHCP_AUDIT_MAC_PATTERN starts with a digit and has seven commas
+    if (text.count(':', start, end) >= 5 or text.count('-', start, end) >= 5 or
+            text.count('.', start, end) >= 2):
+        if MAC_HINT.search(text, start, end) is not None:
+            return True
+    return text[start:start + 1].isdigit() and text.count(',', start, end) >= 7
+
+
+def scan_log_file(source, custom_regexes=(), check_ips=True, sort_ips=False,
+                  protocols=PROTOCOLS, stats=None, mapped=None, workers=None,
+                  ip_details=False, timeline=None, regex_guard=None, incomplete=None,
+                  macs=None):
+    # The source is a path or a seekable file-like object opened in binary mode
+    # (eg: a stream over the evidence, so it does not need a temp copy)
+    # Returns the IPs list and a dictionary with the matches of each RegEx
+    # eg: ([[192.168.1.1, "HTTP",2]], {"user\d": {"user1": 3}})
+    # If a stats dictionary is given, the scanner statistics are added to it
+    # Big files (or mapped=True) are memory mapped (file-like objects are read)
+    # and scanned in chunks, huge files (or workers > 1) are also split between
+    # parallel workers
+    # The results are the same as streaming them line by line
+    # With ip_details, each IP entry also has the byte offsets of its first
+    # and last lines and a few sample lines (see LogScanner.iter_ips)
+    # If a timeline dictionary is given, the timestamp format of the log is
+    # detected and the times of the IPs and matches are put in it
+    # eg: {'formats': ['CBS'], 'ips': {(ip, protocol): TimeBuckets},
+    #      'regexes': {regex: {match: TimeBuckets}}}
+    # With a RegexGuard, each custom RegEx has a time budget and the degraded
+    # ones are skipped. If an incomplete dictionary is given, the RegExes that
+    # did not go through the whole file are put in it, with the reason
+    # eg: {"(a+)+b": "Out of time"}
+    # If a macs list is given, the MAC addresses are also extracted and their
+    # entries are added to it (see LogScanner.iter_macs), their times go in
+    # the timeline under 'macs' (eg: {"00-0C-29-AB-CD-EF": TimeBuckets})
+    custom_regexes, skipped_regexes, time_budget = _guard_regexes(custom_regexes, regex_guard)
+    check_macs = macs is not None
+    size = _source_size(source)
+    if mapped is None:
+        mapped = size >= MAPPED_SCAN_THRESHOLD
+    if workers is None:
+        workers = _available_workers() if size >= PARALLEL_SCAN_THRESHOLD else 1
+
+    timestamp_format = None
+    if timeline is not None:
+        timestamp_format = detect_timestamp_format(_read_head_lines(source))
+        # A range can't know the time carried over from the one before it
+        if timestamp_format is not None and timestamp_format.carry_forward:
+            workers = 1
+
+    if workers > 1 and _can_scan_in_parallel(source):
+        ranges = _line_aligned_ranges(
+            source, min(workers, max(1, size // PARALLEL_MIN_RANGE_SIZE)))
+    else:
+        ranges = []
+
+    if len(ranges) > 1:
+        scanner = _scan_ranges(source, ranges, custom_regexes, check_ips, protocols,
+                               workers, timestamp_format, time_budget, check_macs)
+    else:
+        scanner = LogScanner(custom_regexes, check_ips, protocols,
+                             timestamp_format=timestamp_format, time_budget=time_budget,
+                             check_macs=check_macs)
         try:
-            occurrences = p_ipv4.findall(line)
-            occurrences.extend(p_ipv6.findall(line))
-
-            for ip in occurrences:
-                if is_valid_ip(ip):
-                    ip = ip.lower()
-                    
-                    # List of protocols contained in the line
-                    # Might have false positives, but protocols surrounded by [] and ()
-                    # Need to be harvested...
-                    line_all_upper = line.upper()
-                    protocol_list = [p for p in PROTOCOLS if p in line_all_upper]
-
-                    # Order protocol list alphabetically and convert to string...
-                    # Sorting protocols and not allowing duplicates means that
-                    # The protocol attribute will have consistency and will be
-                    # Easily filtered in any format
-                    protocol = 'N/A'
-                    if protocol_list:
-                        protocol = u''
-                        for p in sorted(protocol_list):
-                            if p not in protocol:
-                                protocol += p + ' '
-
-                    # Search for the IP + Protocol combination in the list, if found incrase the counter else create one
-                    found_entry = False
-                    for entry in list_ips:
-                        if entry[0] == ip and entry[1] == protocol:
-                            entry[2] +=1
-                            found_entry = True
-                            break 
-                    if not found_entry:
-                        list_ips.append([ip,protocol,1])
-        except JavaException as e:
-            raise StandardError(u'Log Extractor Exception: ' + e.getMessage())
+            if mapped:
+                for text in _iter_mapped_chunks(source):
+                    scanner.scan_text(text)
+            else:
+                scanner.scan_lines(_iter_file_lines(source))
+        finally:
+            scanner.close()
+    if stats is not None:
+        _add_stats(stats, scanner.stats)
+    if timeline is not None:
+        _add_timeline(timeline, scanner, [timestamp_format])
+    if check_macs:
+        macs.extend(scanner.iter_macs(sort_ips))
+    _report_incomplete(scanner, skipped_regexes, regex_guard, incomplete)
+    return scanner.list_ips(sort_ips, ip_details), scanner.regex_results
 
-    return list_ips
 
+def scan_log_streams(streams, custom_regexes=(), check_ips=True, sort_ips=False,
+                     protocols=PROTOCOLS, stats=None, ip_details=False, timeline=None,
+                     regex_guard=None, incomplete=None, macs=None):
+    # Same as scan_log_file, for logs that can only be read sequentially
+    # (eg: decompressed on the fly), the results of all streams are added up
+    # Offsets are counted over the decompressed content of all the streams
+    # The timestamp format is detected for each stream
+    # The time budget of the custom RegExes is for all the streams together
+    custom_regexes, skipped_regexes, time_budget = _guard_regexes(custom_regexes, regex_guard)
+    scanner = LogScanner(custom_regexes, check_ips, protocols, time_budget=time_budget,
+                         check_macs=macs is not None)
+    timestamp_formats = []
+    try:
+        for stream in streams:
+            lines = _iter_file_lines(stream, rewind=False)
+            if timeline is not None:
+                head_lines = list(islice(lines, DETECT_LINES))
+                timestamp_format = detect_timestamp_format(head_lines)
+                timestamp_formats.append(timestamp_format)
+                scanner.set_timestamp_format(timestamp_format)
+                lines = chain(head_lines, lines)
+            scanner.scan_lines(lines)
+    finally:
+        scanner.close()
+    if stats is not None:
+        _add_stats(stats, scanner.stats)
+    if timeline is not None:
+        _add_timeline(timeline, scanner, timestamp_formats)
+    if macs is not None:
+        macs.extend(scanner.iter_macs(sort_ips))
+    _report_incomplete(scanner, skipped_regexes, regex_guard, incomplete)
+    return scanner.list_ips(sort_ips, ip_details), scanner.regex_results
 
-def extract_custom_regex(path_to_file, regex):
-    regex_dict = {}
+
+def _available_workers():
+    if Callable is not None:
+        return Runtime.getRuntime().availableProcessors()
+    return multiprocessing.cpu_count()
+
+
+def _is_path(source):
+    return isinstance(source, basestring)
+
+
+def _source_size(source):
+    if _is_path(source):
+        return os.path.getsize(source)
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return size
+
+
+def _read_head_lines(source):
+    # First lines of the file, to detect its timestamp format
+    if _is_path(source):
+        with open(source, 'rb') as f:
+            head = f.read(DETECT_SIZE)
+    else:
+        source.seek(0)
+        head = source.read(DETECT_SIZE)
+        source.seek(0)
+    lines = head.split('\n')
+    if len(head) == DETECT_SIZE:
+        # The last line may be cut
+        lines.pop()
+    return lines[:DETECT_LINES]
+
+
+def _guard_regexes(custom_regexes, regex_guard):
+    # Returns the RegExes to use, the degraded ones and the time budget
+    if regex_guard is None:
+        return custom_regexes, [], None
+    skipped_regexes = [regex for regex in custom_regexes if regex_guard.is_degraded(regex)]
+    custom_regexes = [regex for regex in custom_regexes if regex not in skipped_regexes]
+    return custom_regexes, skipped_regexes, regex_guard.time_budget
+
+
+def _report_incomplete(scanner, skipped_regexes, regex_guard, incomplete):
+    for regex in skipped_regexes:
+        scanner.regex_results[regex] = {}
+        scanner.incomplete[regex] = REGEX_DEGRADED
+    if regex_guard is not None:
+        for regex, reason in scanner.incomplete.iteritems():
+            if reason == REGEX_OUT_OF_TIME:
+                regex_guard.add_overrun(regex)
+    if incomplete is not None:
+        incomplete.update(scanner.incomplete)
+
+
+def _add_timeline(timeline, scanner, timestamp_formats):
+    timeline.setdefault('formats', []).extend(
+        timestamp_format.name for timestamp_format in timestamp_formats
+        if timestamp_format is not None)
+    _merge_times(timeline.setdefault('ips', {}), scanner.ip_times)
+    if scanner.check_macs:
+        _merge_times(timeline.setdefault('macs', {}),
+                     dict((mac_to_str(mac), times) for mac, times in scanner.mac_times.iteritems()))
+    regex_timeline = timeline.setdefault('regexes', {})
+    for regex, times in scanner.regex_times.iteritems():
+        _merge_times(regex_timeline.setdefault(regex, {}), times)
+
+
+def _can_scan_in_parallel(source):
+    # Each worker needs its own reader: a path, or a file-like object that can
+    # be reopened (only shared with Java threads, it can't go to other processes)
+    if _is_path(source):
+        return True
+    return Callable is not None and hasattr(source, 'reopen')
+
+
+def _line_aligned_ranges(source, count):
+    # Splits the file in (start, end) byte ranges of about the same size
+    # Every range starts at the beginning of a line
+    size = _source_size(source)
+    bounds = [0]
+    f = open(source, 'rb') if _is_path(source) else source
     try:
-        lines = _read_file_lines(path_to_file)
-    except IOError:
-        raise
+        for i in xrange(1, count):
+            # Move to the start of the next line
+            position = _next_line_start(f, max(size * i // count - 1, bounds[-1]))
+            if position is None:
+                # The rest of the file is a single line
+                break
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    finally:
+        if f is not source:
+            f.close()
+    bounds.append(size)
+    return zip(bounds[:-1], bounds[1:])
 
-    pattern = re.compile(regex)
+
+def _next_line_start(f, position):
+    # Offset just after the first line ending at or after position, or None
+    # The file is read a buffer at a time, so a long line is never held whole
+    f.seek(position)
+    while True:
+        chunk = f.read(READ_BUFFER_SIZE)
+        if not chunk:
+            return None
+        line_end = chunk.find('\n')
+        if line_end != -1:
+            return position + line_end + 1
+        position += len(chunk)
+
+
+def _scan_range(args):
+    (source, start, end, custom_regexes, check_ips, protocols,
+     timestamp_format_name, time_budget, check_macs) = args
+    if not _is_path(source):
+        source = source.reopen()
     try:
-        for line in lines:
-            occurrences = pattern.findall(line)
-            for match in occurrences:
-                match = match.lower()
-                if regex_dict.get(match):
-                    regex_dict[match] += 1
-                else:
-                    regex_dict[match] = 1
-    except:
-        raise
+        # The format goes by name, so it can be sent to other processes
+        timestamp_format = None
+        if timestamp_format_name is not None:
+            timestamp_format = get_timestamp_format(timestamp_format_name)
+        scanner = LogScanner(custom_regexes, check_ips, protocols,
+                             timestamp_format=timestamp_format, time_budget=time_budget,
+                             check_macs=check_macs)
+        scanner.position = start
+        try:
+            for text in _iter_mapped_chunks(source, MAPPED_CHUNK_SIZE, start, end):
+                scanner.scan_text(text)
+        finally:
+            # The scanner goes back without its worker (to another process under CPython)
+            scanner.close()
+    finally:
+        if not _is_path(source):
+            source.close()
+    return scanner
+
+
+if Callable is not None:
+    class _RangeScanTask(Callable):
+        def __init__(self, args):
+            self.args = args
+
+        def call(self):
+            return _scan_range(self.args)
 
-    return regex_dict
+
+def _scan_ranges(source, ranges, custom_regexes, check_ips, protocols, workers,
+                 timestamp_format=None, time_budget=None, check_macs=False):
+    # Scans each range on a worker and merges the scanners in file order,
+    # which keeps the order in which the IPs were first seen
+    # The time budget of each RegEx is for the whole file, so it is shared
+    # between the ranges
+    timestamp_format_name = timestamp_format.name if timestamp_format is not None else None
+    if time_budget is not None:
+        time_budget = float(time_budget) / len(ranges)
+    tasks = [(source, start, end, list(custom_regexes), check_ips, list(protocols),
+              timestamp_format_name, time_budget, check_macs)
+             for start, end in ranges]
+    if Callable is not None:
+        executor = Executors.newFixedThreadPool(min(workers, len(tasks)))
+        try:
+            futures = [executor.submit(_RangeScanTask(task)) for task in tasks]
+            scanners = [future.get() for future in futures]
+        finally:
+            executor.shutdown()
+    else:
+        pool = multiprocessing.Pool(min(workers, len(tasks)))
+        try:
+            scanners = pool.map(_scan_range, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    scanner = scanners[0]
+    for other in scanners[1:]:
+        scanner.merge(other)
+    return scanner
+
+
+def _add_stats(total, stats):
+    for key, value in stats.iteritems():
+        total[key] = total.get(key, 0) + value
+
+
+def extract_ip_addresses(path_to_file, sort=False, details=False):
+    list_ips, _ = scan_log_file(path_to_file, sort_ips=sort, ip_details=details)
+    return list_ips
+
+
+def extract_custom_regex(path_to_file, regex):
+    _, regex_results = scan_log_file(path_to_file, [regex], check_ips=False)
+    return regex_results[regex]
+
+
+def extract_mac_addresses(path_to_file, sort=False):
+    macs = []
+    scan_log_file(path_to_file, check_ips=False, sort_ips=sort, macs=macs)
+    return macs
 
 
 def is_valid_ipv4(address):
@@ -117,12 +1372,278 @@ def is_valid_ip(address):
     return is_valid_ipv4(address) or is_valid_ipv6(address)
 
 
-def _read_file_lines(path_to_file):
-    lines = []
+def classify_ip(ip_addr):
+    # Private, Loopback, Link-local, Reserved or Public
+    return IP_CLASSES[IP_CLASS_TABLES[ip_addr.version].classify(int(ip_addr))]
+
+
+def classify_ips(ip_addrs):
+    # Types of a batch of netaddr IPAddress objects, in the same order
+    types = [None] * len(ip_addrs)
+    for version, table in IP_CLASS_TABLES.iteritems():
+        positions = [i for i, ip_addr in enumerate(ip_addrs) if ip_addr.version == version]
+        values = [int(ip_addrs[i]) for i in positions]
+        for position, ip_class in zip(positions, table.classify_many(values)):
+            types[position] = IP_CLASSES[ip_class]
+    return types
+
+
+class IPInfo(object):
+    """Class for what is known about a raw IP match
+        valid: If the match is a valid IPv4 or IPv6 address (boolean)
+        canonical: Normalized form of the address, lower case (string)
+        version: 4 or 6, None if not valid (int)
+        ip_type: Private, Loopback, Link-local, Reserved or Public, None if not valid (string)
+    """
+
+    def __init__(self, address, batch=None, index=0):
+        # The address can come already parsed, at the index of a netaddr IPBatch
+        if batch is None:
+            batch = parse_ips([address], netaddr.INET_PTON)
+        value, version, self.valid, self.ip_type = batch[index]
+        self.canonical = batch.canonical(index) if self.valid else address.lower()
+        self.version = version if self.valid else None
+
+
+class IPInfoCache(object):
+    """Bounded LRU cache of IPInfo, keyed by the raw match
+        Logs repeat the same few addresses over and over, so the validation
+        and classification of each one is done once and shared by all threads
+        max_size: Maximum number of addresses kept (int)
+    """
+
+    def __init__(self, max_size=IP_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, address):
+        with self._lock:
+            info = self._entries.pop(address, None)
+            if info is not None:
+                # Put it back as the most recently used
+                self._entries[address] = info
+                self.hits += 1
+                return info
+            self.misses += 1
+
+        # Work out the information outside the lock, other threads can keep going
+        info = IPInfo(address)
+        self._put([(address, info)])
+        return info
+
+    def get_many(self, addresses):
+        # IPInfo of each address, the missing ones are parsed together
+        infos = [None] * len(addresses)
+        missing = []
+        with self._lock:
+            for i, address in enumerate(addresses):
+                info = self._entries.pop(address, None)
+                if info is not None:
+                    self._entries[address] = info
+                    self.hits += 1
+                    infos[i] = info
+                else:
+                    self.misses += 1
+                    missing.append(i)
+        if missing:
+            batch = parse_ips([addresses[i] for i in missing], netaddr.INET_PTON)
+            for index, i in enumerate(missing):
+                infos[i] = IPInfo(addresses[i], batch, index)
+            self._put([(addresses[i], infos[i]) for i in missing])
+        return infos
+
+    def _put(self, items):
+        with self._lock:
+            for address, info in items:
+                self._entries[address] = info
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by every ingest thread
+IP_INFO_CACHE = IPInfoCache()
+
+
+def get_ip_info(address):
+    return IP_INFO_CACHE.get(address)
+
+
+def get_ip_infos(addresses):
+    return IP_INFO_CACHE.get_many(addresses)
+
+
+def mac_to_str(mac):
+    # eg: 00-0C-29-AB-CD-EF, the same form netaddr gives to EUI-48 addresses
+    digits = '%012X' % mac
+    return '-'.join(digits[i:i + 2] for i in xrange(0, 12, 2))
+
+
+# Vendors by OUI (or IAB), shared by every ingest thread
+# Logs repeat the same few vendors, each one is only looked up in the tables once
+MAC_VENDORS = {}
+
+
+def get_mac_vendor(mac):
+    # Organisation the MAC address (int) was assigned to by the IEEE
+    if mac & 0x020000000000:
+        # eg: the random addresses of Wi-Fi clients
+        return MAC_LOCALLY_ADMINISTERED
+    # The addresses of the 00-50-C2 blocks belong to the IAB holders
+    key = mac >> 12
+    if not 0x50C2000 <= key <= 0x50C2FFF:
+        key = mac >> 24
+    vendor = MAC_VENDORS.get(key)
+    if vendor is None:
+        table = OUI_TABLE if key <= 0xFFFFFF else IAB_TABLE
+        vendor = table.org(key) or MAC_NOT_REGISTERED
+        # Dictionary updates are atomic, at worst two threads look it up twice
+        MAC_VENDORS[key] = vendor
+    return vendor
+
+
+def _iter_file_lines(source, buffer_size=READ_BUFFER_SIZE, rewind=True):
+    # Lines are rebuilt from a fixed size buffer and yielded one at a time,
+    # so memory stays flat no matter how big the log is.
+    # The lines are the same (line ending included) as the ones from readlines()
+    # on the file opened in binary mode, so their lengths add up to byte offsets
+    # Lines longer than MAX_LINE_LENGTH are yielded in pieces of that size
+    # File-like objects are read from the start, unless rewind is False
+    # (eg: not seekable)
+    if _is_path(source):
+        f = open(source, 'rb')
+    else:
+        f = source
+        if rewind:
+            f.seek(0)
+    try:
+        # Parts of the line being read, joined once its end shows up
+        # (adding each chunk to a string would copy the line over and over)
+        pending = []
+        pending_size = 0
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            lines = chunk.split('\n')
+            last = lines.pop()
+            if lines:
+                if pending:
+                    pending.append(lines[0])
+                    lines[0] = ''.join(pending)
+                    pending = []
+                    pending_size = 0
+                for line in lines:
+                    if len(line) < MAX_LINE_LENGTH:
+                        yield line + '\n'
+                    else:
+                        for piece in _line_pieces(line + '\n'):
+                            yield piece
+            if last:
+                pending.append(last)
+                pending_size += len(last)
+                if pending_size >= MAX_LINE_LENGTH:
+                    # Whole pieces go now, the rest stays for the next chunk
+                    line = ''.join(pending)
+                    cut = len(line) - len(line) % MAX_LINE_LENGTH
+                    for piece in _line_pieces(line[:cut]):
+                        yield piece
+                    pending = [line[cut:]] if cut < len(line) else []
+                    pending_size = len(line) - cut
+        if pending:
+            for piece in _line_pieces(''.join(pending)):
+                yield piece
+    finally:
+        if f is not source:
+            f.close()
+
+
+def _line_pieces(line):
+    # The line cut every MAX_LINE_LENGTH bytes
+    for start in xrange(0, len(line), MAX_LINE_LENGTH):
+        yield line[start:start + MAX_LINE_LENGTH]
+
+
+def _iter_mapped_chunks(source, chunk_size=MAPPED_CHUNK_SIZE, start=0, end=None):
+    # Maps the file (or its bytes from start to end) chunk by chunk and yields
+    # blocks made only of whole lines
+    # A line that straddles two chunks is carried over to the next block
+    # A line longer than MAX_LINE_LENGTH is carried over only up to that size,
+    # its whole pieces go in a block of their own
+    pending = []
+    pending_size = 0
+    for chunk in _iter_mapped_windows(source, chunk_size, start, end):
+        last_line_end = chunk.rfind('\n')
+        if last_line_end == -1:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= MAX_LINE_LENGTH:
+                line = ''.join(pending)
+                cut = len(line) - len(line) % MAX_LINE_LENGTH
+                yield line[:cut]
+                pending = [line[cut:]] if cut < len(line) else []
+                pending_size = len(line) - cut
+            continue
+        pending.append(chunk[:last_line_end + 1])
+        yield ''.join(pending)
+        pending = [chunk[last_line_end + 1:]]
+        pending_size = len(pending[0])
+    if pending_size:
+        yield ''.join(pending)
+
+
+def _iter_mapped_windows(source, chunk_size, start=0, end=None):
+    size = _source_size(source)
+    if end is None or end > size:
+        end = size
+    if start >= end:
+        return
+
+    if not _is_path(source):
+        # File-like objects are read window by window instead
+        source.seek(start)
+        position = start
+        while position < end:
+            window = source.read(min(chunk_size, end - position))
+            if not window:
+                break
+            yield window
+            position += len(window)
+        return
+
+    path_to_file = source
+    if mmap is not None:
+        with open(path_to_file, 'rb') as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for position in xrange(start, end, chunk_size):
+                    yield mapped_file[position:min(position + chunk_size, end)]
+            finally:
+                mapped_file.close()
+        return
+
+    random_access_file = RandomAccessFile(path_to_file, 'r')
     try:
-        f = open(path_to_file, 'r')
-        lines = f.readlines()
-        f.close()
-    except IOError:
-        raise
-    return lines
+        channel = random_access_file.getChannel()
+        position = start
+        while position < end:
+            length = min(chunk_size, end - position)
+            mapped_buffer = channel.map(
+                FileChannel.MapMode.READ_ONLY, position, length)
+            # One byte per character, the same as reading the file with open()
+            yield PyString(StringUtil.fromBytes(mapped_buffer))
+            position += length
+    finally:
+        random_access_file.close()
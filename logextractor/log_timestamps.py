@@ -0,0 +1,141 @@
+import re
+import calendar
+import time
+
+# Lines looked at to find out the timestamp format of a log
+DETECT_LINES = 50
+# Bytes read from the start of a log to get those lines
+DETECT_SIZE = 64 * 1024
+
+
+class TimestampFormat(object):
+    """Class for a timestamp format found in Windows logs
+        name: Name of the format (string)
+        regex: RegEx with the year, month, day, hour, minute and second groups,
+            and an optional UTC offset group (string)
+        anchored: If the timestamp is at the start of the line (boolean)
+        carry_forward: If the lines without a timestamp belong to the last one
+            found, eg: the lines of a setupapi section (boolean)
+    """
+
+    def __init__(self, name, regex, anchored=True, carry_forward=False):
+        self.name = name
+        self.regex = regex
+        self.anchored = anchored
+        self.carry_forward = carry_forward
+        self.pattern = re.compile(regex)
+        # Seconds since the epoch of the days already seen, logs repeat them a lot
+        self._days = {}
+
+    def parse(self, text, start=0, end=None):
+        # Returns the time of text[start:end] in seconds since the epoch
+        # (time as written in the log, unless it has a UTC offset)
+        # or None if it has no timestamp
+        if end is None:
+            end = len(text)
+        if self.anchored:
+            match = self.pattern.match(text, start, end)
+        else:
+            match = self.pattern.search(text, start, end)
+        if match is None:
+            return None
+
+        groups = match.groups()
+        day = groups[0:3]
+        day_time = self._days.get(day)
+        if day_time is None:
+            year, month, mday = int(day[0]), int(day[1]), int(day[2])
+            if not (1 <= month <= 12 and 1 <= mday <= 31):
+                return None
+            day_time = calendar.timegm((year, month, mday, 0, 0, 0))
+            self._days[day] = day_time
+
+        hour, minute, second = int(groups[3]), int(groups[4]), int(groups[5])
+        if hour > 23 or minute > 59 or second > 60:
+            return None
+        timestamp = day_time + hour * 3600 + minute * 60 + second
+
+        # eg: +01:00, -0500 or Z
+        utc_offset = groups[6] if len(groups) > 6 else None
+        if utc_offset and utc_offset != 'Z':
+            offset = int(utc_offset[1:3]) * 3600 + int(utc_offset[-2:]) * 60
+            timestamp += -offset if utc_offset[0] == '+' else offset
+        return timestamp
+
+
+# The most specific formats go first, they win the ties
+TIMESTAMP_FORMATS = [
+    # CBS.log: 2018-01-01 10:00:00, Info                  CBS    Starting...
+    TimestampFormat('CBS', r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d), '),
+    # WindowsUpdate.log: 2018-01-01	10:00:00:123	 996	1a8	Agent	...
+    TimestampFormat('WindowsUpdate', r'(\d{4})-(\d\d)-(\d\d)\t(\d\d):(\d\d):(\d\d):\d{3}\t'),
+    # W3C / IIS: 2018-01-01 10:00:00 W3SVC1 10.0.0.1 GET /index.html ...
+    TimestampFormat('W3C', r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d) '),
+    # setupapi.dev.log: >>>  Section start 2018/01/01 10:00:00.123
+    TimestampFormat('setupapi', r'(?:>>>|<<<)  Section (?:start|end) (\d{4})/(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)',
+                    carry_forward=True),
+    # ISO-8601 anywhere in the line: 2018-01-01T10:00:00.123+01:00
+    TimestampFormat('ISO-8601', r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:[.,]\d+)?(Z|[+-]\d\d:?\d\d)?',
+                    anchored=False),
+]
+
+
+def detect_timestamp_format(lines, formats=TIMESTAMP_FORMATS):
+    # Returns the format found in most of the first lines of a log
+    # or None if none of them has a timestamp
+    lines = [line for line in lines[:DETECT_LINES] if line.strip()]
+    best_format = None
+    best_count = 0
+    for timestamp_format in formats:
+        count = 0
+        for line in lines:
+            if timestamp_format.parse(line) is not None:
+                count += 1
+        if count > best_count:
+            best_format = timestamp_format
+            best_count = count
+    return best_format
+
+
+def get_timestamp_format(name, formats=TIMESTAMP_FORMATS):
+    for timestamp_format in formats:
+        if timestamp_format.name == name:
+            return timestamp_format
+    return None
+
+
+class TimeBuckets(object):
+    """Class for when something shows up in a log
+        first_seen: Earliest time, seconds since the epoch (int)
+        last_seen: Latest time, seconds since the epoch (int)
+        hours: Occurrences in each hour, keyed by the start of the hour (dictionary)
+    """
+
+    def __init__(self):
+        self.first_seen = None
+        self.last_seen = None
+        self.hours = {}
+
+    def add(self, timestamp, count=1):
+        if self.first_seen is None or timestamp < self.first_seen:
+            self.first_seen = timestamp
+        if self.last_seen is None or timestamp > self.last_seen:
+            self.last_seen = timestamp
+        hour = timestamp - timestamp % 3600
+        self.hours[hour] = self.hours.get(hour, 0) + count
+
+    def merge(self, other):
+        if other.first_seen is None:
+            return
+        if self.first_seen is None or other.first_seen < self.first_seen:
+            self.first_seen = other.first_seen
+        if self.last_seen is None or other.last_seen > self.last_seen:
+            self.last_seen = other.last_seen
+        for hour, count in other.hours.iteritems():
+            self.hours[hour] = self.hours.get(hour, 0) + count
+
+    def histogram(self):
+        # One "hour count" entry per line, in time order
+        # eg: "2018-01-01 10:00 3"
+        return '\n'.join(time.strftime('%Y-%m-%d %H:00', time.gmtime(hour)) + ' ' + str(count)
+                         for hour, count in sorted(self.hours.iteritems()))
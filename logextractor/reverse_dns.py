@@ -0,0 +1,227 @@
+import socket
+import threading
+import time
+from collections import deque
+from logextractor.log_extractor import get_ip_info
+
+# Lookups running at the same time
+DNS_WORKERS = 8
+# Seconds the answer of a lookup is waited for, from when the lookup starts
+DNS_TIMEOUT = 5.0
+# Longest time (s) all the answers of an ingest thread are waited for
+DNS_DRAIN_TIMEOUT = 120.0
+# Seconds between checks on a lookup that is still in the queue
+DNS_QUEUE_POLL = 0.1
+# Seconds a failed lookup is remembered, then it is tried again
+DNS_NEGATIVE_TTL = 24 * 3600
+
+# Domains given when there is no name
+DNS_SAME_AS_IP = 'Same as IP'
+DNS_NOT_FOUND = 'Not found'
+DNS_TIMED_OUT = 'Timed out'
+
+
+class _Query(object):
+    # Lookup of one address, waited for with its event
+    def __init__(self, ip):
+        self.ip = ip
+        self.domain = None
+        # When a worker started the lookup, None while it is in the queue
+        self.started = None
+        self.done = threading.Event()
+
+
+class ReverseDNSResolver(object):
+    """Reverse DNS lookups done by a pool of worker threads, away from the ingest
+        The answers, found or not, are kept in the cache so an address is only
+        looked up once per case
+        cache: Object with get(ip) and put(ip, domain), None to keep them in memory
+        hosts: Names of the addresses known beforehand, eg: from read_hosts_file (dictionary)
+        offline: If only the hosts are used, nothing is sent to the network (boolean)
+        workers: Lookups running at the same time (int)
+        timeout: Seconds the answer of each lookup is waited for, once it started (float)
+    """
+
+    def __init__(self, cache=None, hosts=None, offline=False,
+                 workers=DNS_WORKERS, timeout=DNS_TIMEOUT):
+        self.cache = cache
+        self.hosts = hosts or {}
+        self.offline = offline
+        self.workers = workers
+        self.timeout = timeout
+        self.lookups = 0
+        self.timeouts = 0
+        self._results = {}
+        self._queries = {}
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._threads = []
+        self._closed = False
+
+    def cached(self, ip):
+        # Domain of the address if it is already known, None otherwise
+        ip = get_ip_info(ip).canonical
+        domain = self.hosts.get(ip)
+        if domain is not None:
+            return domain
+        with self._lock:
+            domain = self._results.get(ip)
+        if domain is None and self.cache is not None:
+            domain = self.cache.get(ip)
+        if domain is None and self.offline:
+            domain = DNS_NOT_FOUND
+        return domain
+
+    def submit(self, ip):
+        # Starts the lookup of the address, if it is not known or on its way
+        if self.cached(ip) is not None:
+            return
+        ip = get_ip_info(ip).canonical
+        with self._lock:
+            if self._closed or ip in self._queries:
+                return
+            self._queries[ip] = _Query(ip)
+            self._queue.append(self._queries[ip])
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name='LFA reverse DNS')
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+            self._has_work.notify()
+
+    def result(self, ip, deadline=None):
+        # Domain of the address, waiting for its lookup up to the resolver
+        # timeout from when the lookup started, and never after the deadline
+        # (seconds since the epoch, by default DNS_DRAIN_TIMEOUT from now)
+        domain = self.cached(ip)
+        if domain is not None:
+            return domain
+        ip = get_ip_info(ip).canonical
+        with self._lock:
+            query = self._queries.get(ip)
+        if query is None:
+            self.submit(ip)
+            with self._lock:
+                query = self._queries.get(ip)
+            if query is None:
+                # Offline (known or not found), or the resolver was closed
+                domain = self.cached(ip)
+                return domain if domain is not None else DNS_TIMED_OUT
+        if deadline is None:
+            deadline = time.time() + DNS_DRAIN_TIMEOUT
+        while not query.done.is_set():
+            now = time.time()
+            # A query still in the queue has not used any of its time yet
+            if query.started is None:
+                wait_until = min(deadline, now + DNS_QUEUE_POLL)
+            else:
+                wait_until = min(deadline, query.started + self.timeout)
+            if now >= deadline or (query.started is not None and now >= wait_until):
+                break
+            query.done.wait(wait_until - now)
+        if query.domain is None:
+            with self._lock:
+                self.timeouts += 1
+            return DNS_TIMED_OUT
+        return query.domain
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._has_work.wait()
+                if self._closed:
+                    return
+                query = self._queue.popleft()
+                query.started = time.time()
+            domain = lookup_domain(query.ip)
+            with self._lock:
+                # The cache may be closed with the resolver
+                if self._closed:
+                    query.done.set()
+                    return
+                self.lookups += 1
+                self._results[query.ip] = domain
+                del self._queries[query.ip]
+                if self.cache is not None:
+                    self.cache.put(query.ip, domain)
+            query.domain = domain
+            query.done.set()
+
+    def close(self):
+        # Stops the workers, the lookups not answered yet are given up
+        # Nothing is put in the cache after this, so it can be closed
+        with self._lock:
+            self._closed = True
+            for query in self._queue:
+                query.done.set()
+            self._queue.clear()
+            self._queries.clear()
+            self._has_work.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {'lookups': self.lookups, 'pending': len(self._queries),
+                    'timeouts': self.timeouts, 'hosts': len(self.hosts)}
+
+
+def lookup_domain(ip):
+    # Blocking reverse lookup, there is no timeout so it runs on the workers
+    try:
+        domain = socket.gethostbyaddr(ip)[0]
+    except (socket.herror, socket.gaierror, socket.error, UnicodeError):
+        return DNS_NOT_FOUND
+    return DNS_SAME_AS_IP if domain == ip else domain
+
+
+def read_hosts_file(path):
+    # Names of the addresses in a hosts file (10.0.0.1 host.example)
+    # or in the PTR records of a DNS zone file
+    # (1.0.0.10.in-addr.arpa. IN PTR host.example.)
+    hosts = {}
+    origin = ''
+    owner = None
+    with open(path) as hosts_file:
+        for line in hosts_file:
+            # Hosts files comment with #, zone files with ;
+            fields = line.split('#', 1)[0].split(';', 1)[0].split()
+            if not fields:
+                continue
+            if fields[0].upper() == '$ORIGIN' and len(fields) > 1:
+                origin = fields[1]
+                continue
+            upper_fields = [field.upper() for field in fields]
+            if 'PTR' in upper_fields:
+                # Records without an owner belong to the last one
+                if not line[0].isspace():
+                    owner = _absolute_name(fields[0], origin)
+                target = fields[upper_fields.index('PTR') + 1:]
+                ip = pointer_to_ip(owner) if owner and target else None
+                if ip is not None:
+                    hosts.setdefault(ip, _absolute_name(target[0], origin).rstrip('.'))
+            elif len(fields) > 1 and get_ip_info(fields[0]).valid:
+                hosts.setdefault(get_ip_info(fields[0]).canonical, fields[1])
+    return hosts
+
+
+def _absolute_name(name, origin):
+    if name == '@':
+        return origin
+    if name.endswith('.') or not origin:
+        return name
+    return name + '.' + origin
+
+
+def pointer_to_ip(name):
+    # Address of an in-addr.arpa or ip6.arpa name, None if it is not one
+    labels = name.lower().rstrip('.').split('.')
+    if labels[-2:] == ['in-addr', 'arpa'] and len(labels) == 6:
+        address = '.'.join(reversed(labels[:4]))
+    elif labels[-2:] == ['ip6', 'arpa'] and len(labels) == 34:
+        nibbles = ''.join(reversed(labels[:32]))
+        address = ':'.join(nibbles[i:i + 4] for i in xrange(0, 32, 4))
+    else:
+        return None
+    info = get_ip_info(address)
+    return info.canonical if info.valid else None
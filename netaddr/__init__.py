@@ -25,6 +25,8 @@ from netaddr.ip import (IPAddress, IPNetwork, IPRange, all_matching_cidrs,
 
 from netaddr.ip.sets import IPSet
 
+from netaddr.ip.bulk import IPBatch, parse_ips
+
 from netaddr.ip.glob import (IPGlob, cidr_to_glob, glob_to_cidrs,
     glob_to_iprange, glob_to_iptuple, iprange_to_globs, valid_glob)
 
@@ -90,9 +90,10 @@ class OUI(BaseIdentifier):
             raise TypeError('unexpected OUI format: %r' % oui)
 
         #   Discover offsets.
-        if self._value in ieee.OUI_INDEX:
+        offsets = ieee.OUI_TABLE.offsets(self._value)
+        if offsets:
             fh = open(ieee.OUI_REGISTRY_PATH, 'rb')
-            for (offset, size) in ieee.OUI_INDEX[self._value]:
+            for (offset, size) in offsets:
                 fh.seek(offset)
                 data = fh.read(size).decode('UTF-8')
                 self._parse_data(data, offset, size)
@@ -255,9 +256,10 @@ class IAB(BaseIdentifier):
             raise TypeError('unexpected IAB format: %r!' % iab)
 
         #   Discover offsets.
-        if self._value in ieee.IAB_INDEX:
+        offsets = ieee.IAB_TABLE.offsets(self._value)
+        if offsets:
             fh = open(ieee.IAB_REGISTRY_PATH, 'rb')
-            (offset, size) = ieee.IAB_INDEX[self._value][0]
+            (offset, size) = offsets[0]
             self.record['offset'] = offset
             self.record['size'] = size
             fh.seek(offset)
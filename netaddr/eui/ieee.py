@@ -32,8 +32,22 @@ More details can be found at the following URLs :-
     - Registration Authority Home Page - http://standards.ieee.org/regauth/
 """
 
+import os as _os
 import os.path as _path
 import csv as _csv
+import struct as _struct
+import threading as _threading
+
+try:
+    import mmap as _mmap
+except ImportError:
+    #   Jython has no mmap module, Java NIO maps the tables instead.
+    _mmap = None
+    import jarray as _jarray
+    from java.io import RandomAccessFile as _RandomAccessFile
+    from java.nio import ByteBuffer as _ByteBuffer
+    from java.nio.channels import FileChannel as _FileChannel
+    from org.python.core.util import StringUtil as _StringUtil
 
 from netaddr.compat import _bytes_type
 from netaddr.core import Subscriber, Publisher
@@ -44,7 +58,11 @@ OUI_REGISTRY_PATH = _path.join(_path.dirname(__file__), 'oui.txt')
 #: Path to netaddr OUI index file.
 OUI_INDEX_PATH = _path.join(_path.dirname(__file__), 'oui.idx')
 
-#: OUI index lookup dictionary.
+#: Path to netaddr OUI binary table, rebuilt when the registry changes.
+OUI_TABLE_PATH = _path.join(_path.dirname(__file__), 'oui.bin')
+
+#: OUI index lookup dictionary. Only filled in by load_indices(), lookups
+#: use OUI_TABLE.
 OUI_INDEX = {}
 
 #: Path to local copy of IEEE IAB Registry data file.
@@ -53,9 +71,23 @@ IAB_REGISTRY_PATH = _path.join(_path.dirname(__file__), 'iab.txt')
 #: Path to netaddr IAB index file.
 IAB_INDEX_PATH = _path.join(_path.dirname(__file__), 'iab.idx')
 
-#: IAB index lookup dictionary.
+#: Path to netaddr IAB binary table, rebuilt when the registry changes.
+IAB_TABLE_PATH = _path.join(_path.dirname(__file__), 'iab.bin')
+
+#: IAB index lookup dictionary. Only filled in by load_indices(), lookups
+#: use IAB_TABLE.
 IAB_INDEX = {}
 
+#: Version of the binary table format, older tables are rebuilt.
+TABLE_VERSION = 1
+
+#: Magic, format version, registry size, registry mtime and record count.
+_TABLE_HEADER = _struct.Struct('>6sHQQI')
+#: Key, registry offset, registry size, name offset and name size.
+_TABLE_RECORD = _struct.Struct('>QIIIH')
+_TABLE_KEY = _struct.Struct('>Q')
+_TABLE_MAGIC = _bytes_type('NAIEEE')
+
 
 class FileIndexer(Subscriber):
     """
@@ -258,6 +290,292 @@ class IABIndexParser(Publisher):
         self.notify(record)
 
 
+class RecordCollector(Subscriber):
+    """
+    A concrete Subscriber that keeps the (index, offset, size) records it
+    receives in a list.
+    """
+    def __init__(self):
+        """Constructor."""
+        self.records = []
+
+    def update(self, data):
+        """
+        Receives and keeps index data.
+
+        :param data: record containing offset record information.
+        """
+        self.records.append(tuple(data))
+
+
+def _registry_signature(registry_path):
+    #   Changes whenever the registry file is replaced or edited.
+    stat = _os.stat(registry_path)
+    return stat.st_size, int(stat.st_mtime)
+
+
+def create_table(registry_path, parser, signature=None):
+    """
+    Builds the binary table of an IEEE registry file.
+
+    :param registry_path: name of the registry file.
+
+    :param parser: the Publisher class that parses the registry records
+        (OUIIndexParser or IABIndexParser).
+
+    :param signature: the (size, mtime) of the registry file written in the
+        table header. (Default: the ones of the file now)
+
+    :return: the table, a byte string with a header, the records sorted by
+        key and the organisation names they point to.
+    """
+    if signature is None:
+        signature = _registry_signature(registry_path)
+
+    collector = RecordCollector()
+    fh = open(registry_path, 'rb')
+    try:
+        registry_parser = parser(fh)
+        registry_parser.attach(collector)
+        registry_parser.parse()
+
+        #   The organisation name ends the first line of each record. Names
+        #   shared by several records (the same vendor) are only kept once.
+        names = []
+        name_offsets = {}
+        names_size = 0
+        records = []
+        for (key, offset, size) in sorted(collector.records):
+            fh.seek(offset)
+            fields = fh.readline().split(None, 2)
+            name = fields[2].strip()[:0xffff] if len(fields) > 2 else _bytes_type('')
+            if name not in name_offsets:
+                name_offsets[name] = names_size
+                names.append(name)
+                names_size += len(name)
+            records.append(_TABLE_RECORD.pack(
+                key, offset, size, name_offsets[name], len(name)))
+    finally:
+        fh.close()
+
+    header = _TABLE_HEADER.pack(_TABLE_MAGIC, TABLE_VERSION, signature[0],
+        signature[1], len(records))
+    return _bytes_type('').join([header] + records + names)
+
+
+def _write_table(table_path, table):
+    temp_path = '%s.%d.tmp' % (table_path, _os.getpid())
+    try:
+        fh = open(temp_path, 'wb')
+        try:
+            fh.write(table)
+        finally:
+            fh.close()
+        if _path.exists(table_path):
+            #   Windows does not replace files on rename.
+            _os.remove(table_path)
+        _os.rename(temp_path, table_path)
+    except (IOError, OSError):
+        #   Read-only installation, or the table is mapped by another
+        #   process. The table is kept in memory only.
+        if _path.exists(temp_path):
+            try:
+                _os.remove(temp_path)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+if _mmap is not None:
+    def _map_file(path):
+        fh = open(path, 'rb')
+        try:
+            #   The mapping stays valid once the file is closed.
+            return _mmap.mmap(fh.fileno(), 0, access=_mmap.ACCESS_READ)
+        finally:
+            fh.close()
+
+    def _wrap_bytes(data):
+        return data
+
+    def _read_key(data, position):
+        return _TABLE_KEY.unpack_from(data, position)[0]
+
+    def _read_bytes(data, position, size):
+        return data[position:position + size]
+else:
+    def _map_file(path):
+        fh = _RandomAccessFile(path, 'r')
+        try:
+            channel = fh.getChannel()
+            return channel.map(_FileChannel.MapMode.READ_ONLY, 0, channel.size())
+        finally:
+            fh.close()
+
+    def _wrap_bytes(data):
+        return _ByteBuffer.wrap(_StringUtil.toBytes(data))
+
+    def _read_key(data, position):
+        #   Java buffers are big-endian, like the table.
+        return data.getLong(position)
+
+    def _read_bytes(data, position, size):
+        chunk = _jarray.zeros(size, 'b')
+        view = data.duplicate()
+        view.position(position)
+        view.get(chunk)
+        return chunk.tostring()
+
+
+class RegistryTable(object):
+    """
+    The records of an IEEE registry file in a compact binary table, sorted
+    by key, memory mapped and binary searched.
+
+    The table is written next to the registry file the first time it is
+    used and rebuilt whenever the registry changes. Lookups read neither the
+    registry nor a text index.
+    """
+    def __init__(self, registry_path, table_path, parser):
+        """
+        Constructor.
+
+        :param registry_path: name of the IEEE registry file.
+
+        :param table_path: name of the binary table file.
+
+        :param parser: the Publisher class that parses the registry records
+            (OUIIndexParser or IABIndexParser).
+        """
+        self.registry_path = registry_path
+        self.table_path = table_path
+        self.parser = parser
+        self._data = None
+        self._count = 0
+        self._names_start = 0
+        self._lock = _threading.Lock()
+
+    def _header(self, data):
+        header = _TABLE_HEADER.unpack(_read_bytes(data, 0, _TABLE_HEADER.size))
+        if header[0] != _TABLE_MAGIC or header[1] != TABLE_VERSION:
+            return None
+        return header
+
+    def _map_table(self, signature):
+        #   The table file if it matches the registry, None otherwise.
+        try:
+            if _os.stat(self.table_path).st_size < _TABLE_HEADER.size:
+                return None
+            data = _map_file(self.table_path)
+        except Exception:
+            #   Missing or unreadable.
+            return None
+        header = self._header(data)
+        if header is None or tuple(header[2:4]) != tuple(signature):
+            return None
+        return data
+
+    def load(self):
+        """
+        Maps the table, building it first if it is missing or out of date.
+        Called on first lookup.
+        """
+        if self._data is not None:
+            return
+        self._lock.acquire()
+        try:
+            if self._data is not None:
+                return
+            signature = _registry_signature(self.registry_path)
+            data = self._map_table(signature)
+            if data is None:
+                table = create_table(self.registry_path, self.parser, signature)
+                if _write_table(self.table_path, table):
+                    data = self._map_table(signature)
+                if data is None:
+                    data = _wrap_bytes(table)
+            self._count = self._header(data)[4]
+            self._names_start = _TABLE_HEADER.size + self._count * _TABLE_RECORD.size
+            self._data = data
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        """:return: the number of records in the table."""
+        self.load()
+        return self._count
+
+    def _record(self, index):
+        return _TABLE_RECORD.unpack(_read_bytes(self._data,
+            _TABLE_HEADER.size + index * _TABLE_RECORD.size, _TABLE_RECORD.size))
+
+    def find(self, key):
+        """
+        :param key: an OUI or IAB as an unsigned integer.
+
+        :return: the index of the first record with the key, or -1 if it is
+            not registered.
+        """
+        self.load()
+        data = self._data
+        record_size = _TABLE_RECORD.size
+        start = _TABLE_HEADER.size
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            if _read_key(data, start + middle * record_size) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and _read_key(data, start + low * record_size) == key:
+            return low
+        return -1
+
+    def __contains__(self, key):
+        """:return: True if the key is registered, False otherwise."""
+        return self.find(key) != -1
+
+    def offsets(self, key):
+        """
+        :param key: an OUI or IAB as an unsigned integer.
+
+        :return: a list with the (offset, size) of each of the key's records
+            in the registry file, empty if it is not registered.
+        """
+        index = self.find(key)
+        offsets = []
+        while 0 <= index < self._count:
+            (record_key, offset, size, _, _) = self._record(index)
+            if record_key != key:
+                break
+            offsets.append((offset, size))
+            index += 1
+        return offsets
+
+    def org(self, key):
+        """
+        :param key: an OUI or IAB as an unsigned integer.
+
+        :return: the name of the organisation of the key's first record, or
+            None if it is not registered.
+        """
+        index = self.find(key)
+        if index == -1:
+            return None
+        (_, _, _, name_offset, name_size) = self._record(index)
+        return _read_bytes(self._data, self._names_start + name_offset,
+            name_size).decode('UTF-8', 'replace')
+
+
+#: Binary table of the OUI registry, loaded on first lookup.
+OUI_TABLE = RegistryTable(OUI_REGISTRY_PATH, OUI_TABLE_PATH, OUIIndexParser)
+
+#: Binary table of the IAB registry, loaded on first lookup.
+IAB_TABLE = RegistryTable(IAB_REGISTRY_PATH, IAB_TABLE_PATH, IABIndexParser)
+
+
 def create_index_from_registry(registry_path, index_path, parser):
     """Generate an index files from the IEEE registry file."""
     oui_parser = parser(registry_path)
@@ -266,9 +584,11 @@ def create_index_from_registry(registry_path, index_path, parser):
 
 
 def create_indices():
-    """Create indices for OUI and IAB file based lookups"""
+    """Create indices and binary tables for OUI and IAB file based lookups"""
     create_index_from_registry(OUI_REGISTRY_PATH, OUI_INDEX_PATH, OUIIndexParser)
     create_index_from_registry(IAB_REGISTRY_PATH, IAB_INDEX_PATH, IABIndexParser)
+    _write_table(OUI_TABLE_PATH, create_table(OUI_REGISTRY_PATH, OUIIndexParser))
+    _write_table(IAB_TABLE_PATH, create_table(IAB_REGISTRY_PATH, IABIndexParser))
 
 
 def load_index(index, index_path):
@@ -292,6 +612,3 @@ def load_indices():
 if __name__ == '__main__':
     #   Generate indices when module is executed as a script.
     create_indices()
-else:
-    #   On module load read indices in memory to enable lookups.
-    load_indices()
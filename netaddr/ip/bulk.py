@@ -0,0 +1,225 @@
+#-----------------------------------------------------------------------------
+#   Copyright (c) 2008 by David P. D. Moss. All rights reserved.
+#
+#   Released under the BSD license. See the LICENSE file for details.
+#-----------------------------------------------------------------------------
+"""Parsing and classification of many IP address strings at once."""
+
+from array import array as _array
+from bisect import bisect_right as _bisect_right
+
+from netaddr.core import AddrFormatError
+from netaddr.strategy import ipv4 as _ipv4, ipv6 as _ipv6
+from netaddr.ip import (IPAddress, IPV4_PRIVATE, IPV4_LOOPBACK,
+    IPV4_LINK_LOCAL, IPV4_RESERVED, IPV6_PRIVATE, IPV6_LOOPBACK,
+    IPV6_LINK_LOCAL, IPV6_RESERVED)
+
+#: Names of the address classes, indexed by the values of IPBatch.classes.
+IP_CLASSES = ('Public', 'Private', 'Loopback', 'Link-local', 'Reserved')
+
+#: Index of the class of the addresses outside of every special range.
+PUBLIC = 0
+
+
+class IPRangeTable(object):
+    """
+    A sorted table of disjoint integer address ranges and their class.
+
+    Overlapping ranges are resolved once, when the table is built, so an
+    address is classified with a single binary search.
+    """
+    def __init__(self, categories, default=PUBLIC):
+        """
+        Constructor.
+
+        :param categories: a sequence of (class, ranges) tuples in order of
+            priority. The ranges are IPNetwork, IPRange or IPAddress objects.
+
+        :param default: the class of the addresses outside of every range.
+        """
+        self.default = default
+        ranges = []
+        for priority, (ip_class, members) in enumerate(categories):
+            for member in members:
+                if isinstance(member, IPAddress):
+                    ranges.append((int(member), int(member), priority, ip_class))
+                else:
+                    ranges.append((member.first, member.last, priority, ip_class))
+
+        #   Every range boundary starts a piece with a single class, the one
+        #   of the range with the highest priority covering it.
+        points = sorted(set([r[0] for r in ranges] + [r[1] + 1 for r in ranges]))
+        self.starts = []
+        self.ends = []
+        self.classes = []
+        for start, next_start in zip(points, points[1:]):
+            covering = [(r[2], r[3]) for r in ranges if r[0] <= start <= r[1]]
+            if not covering:
+                continue
+            ip_class = min(covering)[1]
+            if (self.classes and self.classes[-1] == ip_class
+                    and self.ends[-1] + 1 == start):
+                #   Join it with the previous piece.
+                self.ends[-1] = next_start - 1
+            else:
+                self.starts.append(start)
+                self.ends.append(next_start - 1)
+                self.classes.append(ip_class)
+
+    def classify(self, int_val):
+        """
+        :param int_val: an unsigned integer address of the table's version.
+
+        :return: the class of the address.
+        """
+        index = _bisect_right(self.starts, int_val) - 1
+        if index >= 0 and int_val <= self.ends[index]:
+            return self.classes[index]
+        return self.default
+
+    def classify_many(self, int_vals):
+        """
+        :param int_vals: a sequence of unsigned integer addresses of the
+            table's version.
+
+        :return: a list with the class of each address, in the same order.
+        """
+        starts, ends, classes = self.starts, self.ends, self.classes
+        default = self.default
+        results = []
+        for int_val in int_vals:
+            index = _bisect_right(starts, int_val) - 1
+            if index >= 0 and int_val <= ends[index]:
+                results.append(classes[index])
+            else:
+                results.append(default)
+        return results
+
+
+#: Class tables by IP version. They follow the order of the IPAddress checks
+#: is_private (which includes link-local addresses), is_loopback,
+#: is_link_local and is_reserved.
+IP_CLASS_TABLES = {
+    4: IPRangeTable([
+        (1, IPV4_PRIVATE + (IPV4_LINK_LOCAL,)),
+        (2, (IPV4_LOOPBACK,)),
+        (3, (IPV4_LINK_LOCAL,)),
+        (4, IPV4_RESERVED)]),
+    6: IPRangeTable([
+        (1, IPV6_PRIVATE + (IPV6_LINK_LOCAL,)),
+        (2, (IPV6_LOOPBACK,)),
+        (3, (IPV6_LINK_LOCAL,)),
+        (4, IPV6_RESERVED)]),
+}
+
+
+class IPBatch(object):
+    """
+    A batch of IP address strings parsed into compact parallel arrays,
+    without building an IPAddress object for each of them.
+
+    For the entry at index i:
+
+    - ``values[i]`` is the unsigned integer value of the address (0 if invalid)
+    - ``versions[i]`` is 4 or 6 (0 if invalid)
+    - ``valid[i]`` is 1 if the string is a valid address, 0 otherwise
+    - ``classes[i]`` is an index into IP_CLASSES (0 if invalid)
+    """
+    __slots__ = ('addresses', 'values', 'versions', 'valid', 'classes')
+
+    def __init__(self, addresses, flags=0):
+        """
+        Constructor.
+
+        :param addresses: a sequence of IPv4 and IPv6 address strings.
+
+        :param flags: decides which rules are applied to the interpretation
+            of the addresses. Supported constants are INET_PTON and ZEROFILL.
+            See the netaddr.core docs for details.
+        """
+        self.addresses = list(addresses)
+        #   IPv6 values do not fit in an array, they are kept in a list.
+        self.values = [0] * len(self.addresses)
+        self.versions = _array('B', [0]) * len(self.addresses)
+        self.valid = _array('B', [0]) * len(self.addresses)
+        self.classes = _array('B', [0]) * len(self.addresses)
+
+        positions = {4: [], 6: []}
+        for i, addr in enumerate(self.addresses):
+            if '/' in addr:
+                continue
+            #   Only IPv6 addresses have colons, so each string is only
+            #   parsed once instead of trying IPv4 and then IPv6.
+            module = _ipv6 if ':' in addr else _ipv4
+            try:
+                self.values[i] = module.str_to_int(addr, flags)
+            except (AddrFormatError, ValueError, TypeError):
+                continue
+            self.versions[i] = module.version
+            self.valid[i] = 1
+            positions[module.version].append(i)
+
+        for version, version_positions in positions.items():
+            classes = IP_CLASS_TABLES[version].classify_many(
+                [self.values[i] for i in version_positions])
+            for i, ip_class in zip(version_positions, classes):
+                self.classes[i] = ip_class
+
+    def __len__(self):
+        """:return: the number of addresses in the batch."""
+        return len(self.addresses)
+
+    def __getitem__(self, index):
+        """
+        :return: a (value, version, valid, class name) tuple for the address
+            at the given index. The class name is None for invalid addresses.
+        """
+        if not self.valid[index]:
+            return (0, 0, False, None)
+        return (self.values[index], self.versions[index], True,
+            IP_CLASSES[self.classes[index]])
+
+    def canonical(self, index):
+        """
+        :return: the normalized string form of the address at the given
+            index, or None if it is not valid.
+        """
+        if not self.valid[index]:
+            return None
+        if self.versions[index] == 4:
+            return _ipv4.int_to_str(self.values[index])
+        return _ipv6.int_to_str(self.values[index])
+
+    def ip(self, index):
+        """
+        :return: an IPAddress for the address at the given index, or None if
+            it is not valid.
+        """
+        if not self.valid[index]:
+            return None
+        return IPAddress(self.values[index], self.versions[index])
+
+
+def parse_ips(addresses, flags=0):
+    """
+    Parses and classifies a batch of IP address strings.
+
+    :param addresses: a sequence of IPv4 and IPv6 address strings.
+
+    :param flags: decides which rules are applied to the interpretation of
+        the addresses. Supported constants are INET_PTON and ZEROFILL.
+
+    :return: an IPBatch with the results, in the same order.
+    """
+    return IPBatch(addresses, flags)
+
+
+def classify_ints(int_vals, version):
+    """
+    :param int_vals: a sequence of unsigned integer addresses.
+
+    :param version: the IP version of all the addresses (4 or 6).
+
+    :return: a list with the IP_CLASSES name of each address.
+    """
+    return [IP_CLASSES[c] for c in IP_CLASS_TABLES[version].classify_many(int_vals)]
@@ -29,23 +29,110 @@ More details can be found at the following URLs :-
     - IEEE Protocols Information Home Page - http://www.iana.org/protocols/
 """
 
+import os as _os
 import os.path as _path
 import sys as _sys
+import threading as _threading
 from xml.sax import make_parser, handler
 
+try:
+    import cPickle as _pickle
+except ImportError:
+    import pickle as _pickle
+
 from netaddr.core import Publisher, Subscriber
 from netaddr.ip import IPAddress, IPNetwork, IPRange, cidr_abbrev_to_verbose
 from netaddr.compat import _dict_items, _callable
 
 
 
+class _InfoDict(dict):
+    """
+    Dictionary filled in by load_info() the first time it is read, so
+    IANA_INFO can be used as before although nothing is parsed at import.
+    """
+    def __getitem__(self, key):
+        _ensure_info()
+        return dict.__getitem__(self, key)
+
+    def __iter__(self):
+        _ensure_info()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        _ensure_info()
+        return dict.__len__(self)
+
+    def __contains__(self, key):
+        _ensure_info()
+        return dict.__contains__(self, key)
+
+    def __repr__(self):
+        _ensure_info()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        _ensure_info()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        _ensure_info()
+        return dict.keys(self)
+
+    def values(self):
+        _ensure_info()
+        return dict.values(self)
+
+    def items(self):
+        _ensure_info()
+        return dict.items(self)
+
+    if hasattr(dict, 'iteritems'):
+        #   Python 2 only.
+        def iterkeys(self):
+            _ensure_info()
+            return dict.iterkeys(self)
+
+        def itervalues(self):
+            _ensure_info()
+            return dict.itervalues(self)
+
+        def iteritems(self):
+            _ensure_info()
+            return dict.iteritems(self)
+
+
 #: Topic based lookup dictionary for IANA information.
-IANA_INFO = {
+#: Filled in by load_info() the first time it is read.
+IANA_INFO = _InfoDict({
     'IPv4': {},
     'IPv6': {},
     'IPv6_unicast': {},
     'multicast': {},
-}
+})
+
+#: IANA data files, in the directory of this module.
+DATA_FILES = (
+    'ipv4-address-space.xml',
+    'ipv6-address-space.xml',
+    'ipv6-unicast-address-assignments.xml',
+    'multicast-addresses.xml',
+)
+
+#: Precompiled range tables of the data files, rebuilt when any of them
+#: changes. Pickles are not shared between Python 2 and 3.
+CACHE_FILE = 'iana-py%d.cache' % _sys.version_info[0]
+
+#: Version of the cache format, older caches are rebuilt.
+CACHE_VERSION = 1
+
+#: Range tables by topic, loaded by load_tables() on first query.
+_tables = None
+_info_loaded = False
+_load_lock = _threading.Lock()
+#: Held while load_info() runs, IANA_INFO is not loaded again from inside it.
+_info_lock = _threading.RLock()
+_info_loading = False
 
 
 class SaxRecordParser(handler.ContentHandler):
@@ -357,28 +444,152 @@ class DictUpdater(Subscriber):
             self.dct[iprange] = data
 
 
-def load_info():
+def load_info(path=None):
     """
     Parse and load internal IANA data lookups with the latest information from
     data files.
-    """
-    PATH = _path.dirname(__file__)
 
-    ipv4 = IPv4Parser(open(_path.join(PATH, 'ipv4-address-space.xml')))
-    ipv4.attach(DictUpdater(IANA_INFO['IPv4'], 'IPv4', 'prefix'))
-    ipv4.parse()
+    It is called the first time IANA_INFO is read (eg: by pprint_info()).
+    query() does not need it, it uses the tables of load_tables().
 
-    ipv6 = IPv6Parser(open(_path.join(PATH, 'ipv6-address-space.xml')))
-    ipv6.attach(DictUpdater(IANA_INFO['IPv6'], 'IPv6', 'prefix'))
-    ipv6.parse()
+    path - directory of the data files, by default the one of this module.
+    """
+    global _info_loaded, _info_loading
+    PATH = path or _path.dirname(__file__)
+
+    _info_lock.acquire()
+    try:
+        _info_loading = True
+        try:
+            ipv4 = IPv4Parser(open(_path.join(PATH, 'ipv4-address-space.xml')))
+            ipv4.attach(DictUpdater(IANA_INFO['IPv4'], 'IPv4', 'prefix'))
+            ipv4.parse()
+
+            ipv6 = IPv6Parser(open(_path.join(PATH, 'ipv6-address-space.xml')))
+            ipv6.attach(DictUpdater(IANA_INFO['IPv6'], 'IPv6', 'prefix'))
+            ipv6.parse()
+
+            ipv6ua = IPv6UnicastParser(open(_path.join(PATH, 'ipv6-unicast-address-assignments.xml')))
+            ipv6ua.attach(DictUpdater(IANA_INFO['IPv6_unicast'], 'IPv6_unicast', 'prefix'))
+            ipv6ua.parse()
+
+            mcast = MulticastParser(open(_path.join(PATH, 'multicast-addresses.xml')))
+            mcast.attach(DictUpdater(IANA_INFO['multicast'], 'multicast', 'address'))
+            mcast.parse()
+        finally:
+            _info_loading = False
+        _info_loaded = True
+    finally:
+        _info_lock.release()
+
+
+def _ensure_info():
+    #   Loads IANA_INFO the first time it is read, except from load_info().
+    if _info_loaded:
+        return
+    _info_lock.acquire()
+    try:
+        if not _info_loaded and not _info_loading:
+            load_info()
+    finally:
+        _info_lock.release()
+
+
+def _data_signature(path):
+    #   Changes whenever a data file is replaced or edited.
+    signature = [CACHE_VERSION]
+    for name in DATA_FILES:
+        stat = _os.stat(_path.join(path, name))
+        signature.append((name, stat.st_size, int(stat.st_mtime)))
+    return signature
+
+
+def _build_tables():
+    #   (first, last, version, record) tuples of each topic, sorted by range,
+    #   so a query compares integers instead of building IP objects.
+    tables = {}
+    for topic, ranges in _dict_items(IANA_INFO):
+        table = []
+        for key, record in _dict_items(ranges):
+            if hasattr(key, 'first'):
+                table.append((key.first, key.last, key.version, record))
+            else:
+                table.append((key.value, key.value, key.version, record))
+        table.sort(key=lambda entry: entry[:3])
+        tables[topic] = table
+    return tables
+
+
+def _read_cache(cache_path, signature):
+    try:
+        fh = open(cache_path, 'rb')
+        try:
+            cached_signature, tables = _pickle.load(fh)
+        finally:
+            fh.close()
+    except Exception:
+        #   Missing, unreadable or written by another netaddr version.
+        return None
+    if cached_signature != signature:
+        return None
+    return tables
+
+
+def _write_cache(cache_path, signature, tables):
+    temp_path = '%s.%d.tmp' % (cache_path, _os.getpid())
+    try:
+        fh = open(temp_path, 'wb')
+        try:
+            _pickle.dump((signature, tables), fh, 2)
+        finally:
+            fh.close()
+        if _path.exists(cache_path):
+            #   Windows does not replace files on rename.
+            _os.remove(cache_path)
+        _os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        #   Read-only installation, the tables are kept in memory only.
+        if _path.exists(temp_path):
+            try:
+                _os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def load_tables(path=None):
+    """
+    Returns the IANA range tables by topic, loading them on first use.
 
-    ipv6ua = IPv6UnicastParser(open(_path.join(PATH, 'ipv6-unicast-address-assignments.xml')))
-    ipv6ua.attach(DictUpdater(IANA_INFO['IPv6_unicast'], 'IPv6_unicast', 'prefix'))
-    ipv6ua.parse()
+    They come from the precompiled cache next to the data files. The cache
+    is rebuilt from the XML data files when it is missing or when they
+    change.
 
-    mcast = MulticastParser(open(_path.join(PATH, 'multicast-addresses.xml')))
-    mcast.attach(DictUpdater(IANA_INFO['multicast'], 'multicast', 'address'))
-    mcast.parse()
+    path - directory of the data files, by default the one of this module.
+        Tables of other directories are not kept.
+    """
+    global _tables
+    if path is None and _tables is not None:
+        return _tables
+
+    _load_lock.acquire()
+    try:
+        if path is None and _tables is not None:
+            return _tables
+        data_path = path or _path.dirname(__file__)
+        cache_path = _path.join(data_path, CACHE_FILE)
+        signature = _data_signature(data_path)
+
+        tables = _read_cache(cache_path, signature)
+        if tables is None:
+            load_info(data_path)
+            tables = _build_tables()
+            _write_cache(cache_path, signature, tables)
+
+        if path is None:
+            _tables = tables
+        return tables
+    finally:
+        _load_lock.release()
 
 
 def pprint_info(fh=None):
@@ -410,34 +621,38 @@ def _within_bounds(ip, ip_range):
     raise Exception('Unsupported IP range or address: %r!' % ip_range)
 
 
+def _query_table(info, name, table, ip_first, ip_last, version):
+    #   Records of the ranges holding all of ip_first to ip_last.
+    for first, last, table_version, record in table:
+        if first > ip_first:
+            #   The table is sorted by the start of the ranges.
+            break
+        if ip_last <= last and table_version == version:
+            info.setdefault(name, [])
+            info[name].append(record)
+
+
 def query(ip_addr):
     """Returns informational data specific to this IP address."""
     info = {}
+    tables = load_tables()
+    if hasattr(ip_addr, 'first'):
+        #   IP network or IP range.
+        (ip_first, ip_last) = (ip_addr.first, ip_addr.last)
+    else:
+        ip_first = ip_last = ip_addr.value
+    version = ip_addr.version
 
-    if ip_addr.version == 4:
-        for cidr, record in _dict_items(IANA_INFO['IPv4']):
-            if _within_bounds(ip_addr, cidr):
-                info.setdefault('IPv4', [])
-                info['IPv4'].append(record)
+    if version == 4:
+        _query_table(info, 'IPv4', tables['IPv4'], ip_first, ip_last, version)
 
         if ip_addr.is_multicast():
-            for iprange, record in _dict_items(IANA_INFO['multicast']):
-                if _within_bounds(ip_addr, iprange):
-                    info.setdefault('Multicast', [])
-                    info['Multicast'].append(record)
-
-    elif ip_addr.version == 6:
-        for cidr, record in _dict_items(IANA_INFO['IPv6']):
-            if _within_bounds(ip_addr, cidr):
-                info.setdefault('IPv6', [])
-                info['IPv6'].append(record)
-
-        for cidr, record in _dict_items(IANA_INFO['IPv6_unicast']):
-            if _within_bounds(ip_addr, cidr):
-                info.setdefault('IPv6_unicast', [])
-                info['IPv6_unicast'].append(record)
+            _query_table(info, 'Multicast', tables['multicast'], ip_first,
+                ip_last, version)
 
-    return info
+    elif version == 6:
+        _query_table(info, 'IPv6', tables['IPv6'], ip_first, ip_last, version)
+        _query_table(info, 'IPv6_unicast', tables['IPv6_unicast'], ip_first,
+            ip_last, version)
 
-#   On module import, read IANA data files and populate lookups dict.
-load_info()
+    return info
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+from netaddr.eui import ieee
+
+
+SAMPLE_DIR = os.path.dirname(__file__)
+
+
+def _sample_table(tmpdir, name, parser):
+    registry_path = os.path.join(str(tmpdir), name)
+    shutil.copy(os.path.join(SAMPLE_DIR, name), registry_path)
+    return ieee.RegistryTable(registry_path, registry_path + '.bin', parser)
+
+
+def test_oui_table_lookups(tmpdir):
+    table = _sample_table(tmpdir, 'sample_oui.txt', ieee.OUIIndexParser)
+    assert len(table) == 1
+    assert os.path.exists(table.table_path)
+
+    assert 0x00cafe in table
+    assert table.find(0x00cafe) == 0
+    assert table.offsets(0x00cafe) == [(1, 138)]
+    assert table.org(0x00cafe) == 'ACME CORPORATION'
+
+    assert 0x00caff not in table
+    assert table.find(0x00caff) == -1
+    assert table.offsets(0x00caff) == []
+    assert table.org(0x00caff) is None
+
+
+def test_iab_table_lookups(tmpdir):
+    table = _sample_table(tmpdir, 'sample_iab.txt', ieee.IABIndexParser)
+    assert table.offsets(84683452) == [(1, 181)]
+    assert table.org(84683452) == 'ACME CORPORATION'
+
+
+def test_table_is_rebuilt_when_registry_changes(tmpdir):
+    table = _sample_table(tmpdir, 'sample_oui.txt', ieee.OUIIndexParser)
+    table.load()
+    signature = ieee._registry_signature(table.registry_path)
+    assert table._map_table(signature) is not None
+
+    with open(table.registry_path, 'a') as fh:
+        fh.write('\n00-CA-FF   (hex)        EXAMPLE INC\n')
+    signature = ieee._registry_signature(table.registry_path)
+    assert table._map_table(signature) is None
+
+    table = ieee.RegistryTable(table.registry_path, table.table_path,
+        ieee.OUIIndexParser)
+    assert table.org(0x00caff) == 'EXAMPLE INC'
+    assert table._map_table(signature) is not None
+
+
+def test_table_ignores_corrupt_file(tmpdir):
+    table = _sample_table(tmpdir, 'sample_oui.txt', ieee.OUIIndexParser)
+    with open(table.table_path, 'wb') as fh:
+        fh.write(b'not a table, but long enough for a header')
+    assert table.org(0x00cafe) == 'ACME CORPORATION'
+
+
+def test_table_kept_in_memory_when_not_writable(tmpdir):
+    table = _sample_table(tmpdir, 'sample_oui.txt', ieee.OUIIndexParser)
+    table.table_path = os.path.join(str(tmpdir), 'missing', 'oui.bin')
+    assert table.org(0x00cafe) == 'ACME CORPORATION'
+    assert not os.path.exists(table.table_path)
+
+
+def test_registry_tables_match_parsers():
+    for table in (ieee.OUI_TABLE, ieee.IAB_TABLE):
+        collector = ieee.RecordCollector()
+        registry_parser = table.parser(table.registry_path)
+        registry_parser.attach(collector)
+        registry_parser.parse()
+        registry_parser.fh.close()
+
+        assert len(table) == len(collector.records)
+        for (key, offset, size) in collector.records:
+            assert (offset, size) in table.offsets(key)
@@ -0,0 +1,61 @@
+import pytest
+
+from netaddr import IPAddress, INET_PTON, parse_ips
+from netaddr.ip.bulk import IP_CLASSES, classify_ints
+
+
+def _ip_class(ip):
+    if ip.is_private():
+        return 'Private'
+    if ip.is_loopback():
+        return 'Loopback'
+    if ip.is_link_local():
+        return 'Link-local'
+    if ip.is_reserved():
+        return 'Reserved'
+    return 'Public'
+
+
+def test_parse_ips_values_and_versions():
+    batch = parse_ips(['192.0.2.1', '::1', 'fe80::1', 'not an ip', '10.0.0.1/8'])
+    assert len(batch) == 5
+    assert list(batch.versions) == [4, 6, 6, 0, 0]
+    assert list(batch.valid) == [1, 1, 1, 0, 0]
+    assert batch.values[0] == int(IPAddress('192.0.2.1'))
+    assert batch.values[2] == int(IPAddress('fe80::1'))
+    assert batch[3] == (0, 0, False, None)
+    assert batch[1] == (1, 6, True, 'Loopback')
+
+
+def test_parse_ips_canonical_and_ip():
+    batch = parse_ips(['FE80:0:0::1', '127.0.0.1', 'x'])
+    assert batch.canonical(0) == 'fe80::1'
+    assert batch.canonical(1) == '127.0.0.1'
+    assert batch.canonical(2) is None
+    assert batch.ip(0) == IPAddress('fe80::1')
+    assert batch.ip(2) is None
+
+
+def test_parse_ips_inet_pton_flag():
+    assert list(parse_ips(['127.1']).valid) == [1]
+    assert list(parse_ips(['127.1'], INET_PTON).valid) == [0]
+
+
+@pytest.mark.parametrize('address', [
+    '0.0.0.0', '1.1.1.1', '10.255.255.255', '100.64.0.1', '127.0.0.1',
+    '169.254.10.1', '172.31.0.1', '192.0.0.8', '192.0.2.1', '192.88.99.1',
+    '192.168.1.1', '198.18.0.1', '198.51.100.1', '203.0.113.1', '224.0.0.1',
+    '225.0.0.1', '233.252.0.1', '234.0.0.1', '239.1.1.1', '240.0.0.1',
+    '255.255.255.255', '::', '::1', '::2', '2001:db8::1', '4000::1',
+    'fc00::1', 'fe80::1', 'fec0::1', 'fe00::1', 'ff02::1', 'ff10::1',
+])
+def test_parse_ips_classes_match_ip_address_checks(address):
+    batch = parse_ips([address])
+    assert batch[0][3] == _ip_class(IPAddress(address))
+
+
+def test_classify_ints():
+    values = [int(IPAddress('10.0.0.1')), int(IPAddress('8.8.8.8'))]
+    assert classify_ints(values, 4) == ['Private', 'Public']
+    assert classify_ints([1], 6) == ['Loopback']
+    assert IP_CLASSES[0] == 'Public'
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+from netaddr import IPAddress, IPNetwork
+from netaddr.ip import iana
+
+
+def _copy_data_files(tmpdir):
+    data_path = os.path.dirname(iana.__file__)
+    for name in iana.DATA_FILES:
+        shutil.copy(os.path.join(data_path, name), str(tmpdir))
+    return str(tmpdir)
+
+
+def test_load_tables_writes_and_reuses_cache(tmpdir):
+    path = _copy_data_files(tmpdir)
+    cache_path = os.path.join(path, iana.CACHE_FILE)
+
+    tables = iana.load_tables(path)
+    assert os.path.exists(cache_path)
+    assert sorted(tables) == ['IPv4', 'IPv6', 'IPv6_unicast', 'multicast']
+
+    signature = iana._data_signature(path)
+    assert iana._read_cache(cache_path, signature) == tables
+    assert iana.load_tables(path) == tables
+
+
+def test_load_tables_rebuilds_cache_when_data_changes(tmpdir):
+    path = _copy_data_files(tmpdir)
+    cache_path = os.path.join(path, iana.CACHE_FILE)
+    iana.load_tables(path)
+
+    data_file = os.path.join(path, 'ipv6-address-space.xml')
+    with open(data_file, 'a') as fh:
+        fh.write('\n')
+    signature = iana._data_signature(path)
+    assert iana._read_cache(cache_path, signature) is None
+
+    iana.load_tables(path)
+    assert iana._read_cache(cache_path, signature) is not None
+
+
+def test_load_tables_ignores_corrupt_cache(tmpdir):
+    path = _copy_data_files(tmpdir)
+    with open(os.path.join(path, iana.CACHE_FILE), 'wb') as fh:
+        fh.write(b'not a pickle')
+    assert iana.load_tables(path)['IPv4']
+
+
+def test_query_from_tables():
+    info = iana.query(IPAddress('224.0.0.1'))
+    assert info['IPv4'][0]['designation'] == 'Multicast'
+    assert info['Multicast'][0]['address'] == '224.0.0.1'
+
+    info = iana.query(IPNetwork('2001:1200::/24'))
+    assert info['IPv6_unicast'][0]['prefix'] == '2001:1200::/23'
+
+    assert iana.query(IPAddress('10.0.0.1'))['IPv4'][0]['prefix'] == '10/8'
+
+
+def test_iana_info_loaded_on_first_access():
+    iana.load_tables()
+    iana._info_loaded = False
+    for ranges in dict.values(iana.IANA_INFO):
+        ranges.clear()
+
+    assert iana.IANA_INFO['IPv4'][IPNetwork('10/8')]['designation'] == 'IANA - Private Use'
+    assert iana._info_loaded
+    assert len(iana.IANA_INFO['multicast']) > 0